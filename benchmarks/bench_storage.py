@@ -0,0 +1,105 @@
+"""Rough timings for the storage engines, the vouch graph and archival.
+
+    python benchmarks/bench_storage.py [vouches]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+import voucharchive  # noqa: E402
+import vouchgraph  # noqa: E402
+
+SCHEMA = """
+CREATE TABLE vouches (user_id INTEGER PRIMARY KEY, vouch_count INTEGER DEFAULT 0);
+CREATE TABLE vouch_records (
+    voucher_id INTEGER, vouched_id INTEGER, timestamp INTEGER DEFAULT 0,
+    PRIMARY KEY (voucher_id, vouched_id));
+CREATE TABLE vouch_reasons (
+    voucher_id INTEGER, vouched_id INTEGER, reason TEXT, timestamp INTEGER,
+    PRIMARY KEY (voucher_id, vouched_id));
+CREATE TABLE vouch_archive_counts (vouched_id INTEGER PRIMARY KEY, archived INTEGER DEFAULT 0);
+"""
+
+
+def timed(label, fn, ops):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {elapsed * 1000:9.1f} ms  {ops / elapsed:12,.0f} ops/s")
+
+
+def bench_engine(name, directory, pairs):
+    print(f"{name} engine")
+    engine = storage.create_engine(name, os.path.join(directory, f"{name}.db"))
+    with engine.connection() as conn:
+        conn.executescript(SCHEMA)
+
+    def vouch_all():
+        # One transaction per vouch, the way the vouch command writes
+        for i, (voucher, vouched) in enumerate(pairs):
+            with engine.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("""INSERT INTO vouches VALUES (?, 1)
+                                ON CONFLICT(user_id) DO UPDATE SET vouch_count = vouch_count + 1""", (vouched,))
+                conn.execute("INSERT OR IGNORE INTO vouch_records VALUES (?, ?, ?)", (voucher, vouched, i + 1))
+                conn.execute("INSERT OR IGNORE INTO vouch_reasons VALUES (?, ?, ?, ?)",
+                             (voucher, vouched, "smooth trade, would deal again", i + 1))
+                conn.execute("COMMIT")
+
+    def lookups():
+        for voucher, vouched in pairs:
+            with engine.connection() as conn:
+                conn.execute("SELECT 1 FROM vouch_records WHERE voucher_id = ? AND vouched_id = ?",
+                             (voucher, vouched)).fetchone()
+
+    def read_copy():
+        with engine.reader() as conn:
+            conn.execute("SELECT COUNT(*) FROM vouch_records").fetchone()
+
+    timed("vouch writes", vouch_all, len(pairs))
+    timed("has-vouched lookups", lookups, len(pairs))
+    timed("reader()", read_copy, 1)
+    timed("snapshot()", engine.snapshot, 1)
+
+    def archive():
+        with engine.connection() as conn:
+            voucharchive.attach(conn, os.path.join(directory, f"{name}-archive.db"))
+            while voucharchive.archive_batch(conn, len(pairs) // 2, 0) != (0, 0):
+                pass
+
+    timed("archive half", archive, len(pairs) // 2)
+    engine.close()
+
+
+def bench_graph(pairs):
+    print("vouch graph")
+    graph = None
+
+    def build():
+        nonlocal graph
+        graph = vouchgraph.VouchGraph(pairs)
+
+    timed("build", build, len(pairs))
+    timed("reciprocal pairs", lambda: sum(1 for _ in graph.reciprocal_pairs()), graph.edge_count)
+    timed("dense clusters", graph.dense_clusters, graph.edge_count)
+    timed("suspicious inflows", graph.suspicious_inflows, graph.edge_count)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rng = random.Random(0)
+    users = max(count // 10, 10)
+    pairs = list({(rng.randrange(users), rng.randrange(users)) for _ in range(count)})
+    with tempfile.TemporaryDirectory() as directory:
+        for name in storage.ENGINES:
+            bench_engine(name, directory, pairs)
+    bench_graph(pairs)
+
+
+if __name__ == "__main__":
+    main()
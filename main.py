@@ -1,14 +1,26 @@
+import time
+STARTUP_STARTED = time.perf_counter()
 import re
 import datetime
 import traceback
 import discord
-from discord.ext import commands
+from discord.ext import commands, bridge
 import sqlite3
 import os
-import time
 import asyncio
-from flask import Flask
+import heapq
+import bisect
+import json
+import hmac
+from flask import Flask, jsonify, request
 from threading import Thread
+import tempfile
+from contextlib import contextmanager, asynccontextmanager
+import vouchdata
+import vouchgraph
+import storage
+import tracing
+import voucharchive
 
 app = Flask(__name__)
 
@@ -16,6 +28,26 @@ app = Flask(__name__)
 def home():
     return "Bot is running!"
 
+# Shared secret for /stats; without it (or a matching token) top voucher ids are left out
+STATS_TOKEN = os.environ.get("STATS_TOKEN")
+
+@app.route('/stats')
+def stats():
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    authorized = bool(STATS_TOKEN) and hmac.compare_digest(token.encode(), STATS_TOKEN.encode())
+    try:
+        days = min(int(request.args.get("days", 30)), 3650)
+    except ValueError:
+        return jsonify(error="days must be an integer"), 400
+    bucket = request.args.get("bucket", "day")
+    if bucket not in ("day", "week"):
+        return jsonify(error="bucket must be day or week"), 400
+    activity = vouch_activity(days, bucket)
+    if not authorized:
+        # Like vouchstats ranges, who vouches is for admins only
+        del activity["top_vouchers"]
+    return jsonify(activity)
+
 def run():
     PORT = int(os.environ.get("PORT", 8080))
     app.run(host="0.0.0.0", port=PORT)
@@ -28,27 +60,120 @@ def keep_alive():
 TOKEN = os.environ.get('DISCORD_TOKEN')
 if TOKEN is None:
     raise ValueError("No Discord token found!")
+# Slash-only mode drops the message intents so the gateway stops sending every message
+SLASH_ONLY = os.environ.get("SLASH_ONLY", "0") == "1"
 intents = discord.Intents.default()
 intents.guilds = True
-intents.messages = True
-intents.message_content = True
+intents.messages = not SLASH_ONLY
+intents.message_content = not SLASH_ONLY
 intents.members = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+# Prefix invocations answer through ctx.respond (a reply); don't ping the author like ctx.send never did
+bot = bridge.Bot(command_prefix="!", intents=intents,
+                 allowed_mentions=discord.AllowedMentions(replied_user=False))
 bot.vouch_spam = {}  # Anti-spam tracking
-bot.discrepancy_notifications = {}
+bot.expected_nicks = {}  # member_id -> nickname we last computed for them
+bot.nick_sync_tasks = {}  # member_id -> pending debounced nickname sync
+bot.alert_recipients = {}  # guild_id -> cached admin members for alerts
+bot.recent_alerts = {}  # (guild_id, member_id, issue) -> last alert time
+bot.command_index = None  # Suggestion indexes per permission tier, built on ready
+bot.outbox_queue = asyncio.Queue()  # dm_outbox row ids ready for delivery
+bot.outbox_workers = []
+bot.dm_closed = {}  # user_id -> when we last got Forbidden DMing them
+bot.vouch_graph = None  # vouchgraph.VouchGraph of vouch_records, loaded during warmup
+bot.vouch_graph_task = None  # The one running rebuild, if any
+bot.vouch_graph_generation = 0  # Bumped on invalidation, rebuilds started earlier are discarded
+bot.vouch_graph_pending = []  # (guild, voucher, member) vouched while the graph was rebuilding
+bot.member_state = {}  # user_id -> (vouch_count, tracking_enabled, unvouchable)
+bot.member_state_complete = False  # True once every user's row has been bulk-loaded
+bot.member_state_generation = 0  # Bumped by reloads, warm-ups started earlier are discarded
+bot.cooldowns = {}  # user_id -> last_vouch_time
+bot.cooldowns_complete = False
+bot.startup_phases = {}  # phase name -> seconds, logged once per process
+bot.jobs = {}  # job_id -> job dict of queued/running background sweeps
+bot.job_cancels = set()  # Job ids an admin asked to cancel
 ADMIN_ALERTS_CHANNEL_ID = 1354897882271977744
 # Admin channel configuration
 STAFF_CHANNEL_NAME = "staff-only"  # Change this to your desired channel name
+NICK_SYNC_DEBOUNCE = 5  # Seconds to let a member's nickname edits settle
+ALERT_ROLE_NAMES = ["Administrator™🌟", "𝓞𝔀𝓷𝓮𝓻 👑", "𓂀 𝒞𝑜-𝒪𝓌𝓃𝑒𝓻 𓂀✅"]
+ALERT_DEDUP_WINDOW = 1800  # Seconds before the same member/issue alerts again
+ALERT_CONCURRENCY = 5  # Max admin DMs in flight at once
+OUTBOX_WORKERS = 3  # Concurrent DM deliveries
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_BACKOFF = 30  # Seconds, doubled after every failed attempt
+DM_CLOSED_RECHECK = 7 * 86400  # Retry users with closed DMs after a week
+NOTIFICATION_TTL = 86400  # Admin alert reactions stay actionable for 24 hours
+NOTIFICATION_CACHE_LIMIT = 5000  # Max alerts held in memory, the rest stay on disk
+MEMBER_LOCK_STRIPES = 257  # Per-member lock stripes, prime so snowflake ids spread evenly
+LOCK_HOT_MEMBERS = 1000  # Contended member ids tracked before the counts are trimmed
+JOB_CONCURRENCY = 2  # Background sweeps running at once, the rest wait their turn
+JOB_CHECKPOINT = 25  # Items between persisted cursor updates
+JOB_PROGRESS_INTERVAL = 5  # Seconds between status message edits
+JOB_HISTORY = 30 * 86400  # Finished jobs are kept this long
+DB_PATH = "vouches.db"
+ARCHIVE_PATH = os.environ.get("ARCHIVE_PATH", "vouches_archive.db")  # Cold tier for old records/reasons
+RETENTION_DAYS = int(os.environ.get("RETENTION_DAYS", 180))  # Age before rows are archived, 0 keeps everything hot
+# With retention off and no archive yet, an empty in-memory archive stands in so no file is created
+ARCHIVE_ENABLED = RETENTION_DAYS > 0 or os.path.exists(ARCHIVE_PATH)
+# "sqlite" (default) or "memory" for an in-memory database snapshotted to DB_PATH
+STORAGE_ENGINE = os.environ.get("STORAGE_ENGINE", "sqlite")
+SNAPSHOT_INTERVAL = int(os.environ.get("SNAPSHOT_INTERVAL", 60))  # Seconds, memory engine only
+TRACING = os.environ.get("TRACING", "0") == "1"  # Opt-in, writes span files under TRACE_DIR
+TRACE_DIR = os.environ.get("TRACE_DIR", "traces")
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", 0.05))  # Share of normal invocations kept
+TRACE_SLOW_MS = int(os.environ.get("TRACE_SLOW_MS", 1000))  # Slower invocations are always kept
+VOUCH_TAG_PATTERN = re.compile(r'[\[［](\d+)V[\]］,]')
+bot.alert_semaphore = asyncio.Semaphore(ALERT_CONCURRENCY)
+bot.job_slots = asyncio.Semaphore(JOB_CONCURRENCY)
+
+tracer = tracing.Tracer(TRACE_DIR, sample_rate=TRACE_SAMPLE_RATE, slow_ms=TRACE_SLOW_MS, enabled=TRACING)
+if TRACING and not tracing.instrument_discord(tracer):
+    print(f"Discord REST spans disabled, py-cord {discord.__version__} is not a tested version")
 
 # Database setup with error handling
+@contextmanager
 def get_db():
-    conn = sqlite3.connect("vouches.db", timeout=30, isolation_level=None)
-    conn.execute("PRAGMA busy_timeout = 30000")
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Connection context from the configured storage engine"""
+    with tracer.span("db.connection", {"db.system": "sqlite"}):
+        with storage_engine.connection() as conn:
+            yield conn
+
+@contextmanager
+def get_archive_db():
+    """get_db() with the cold archive attached as the `archive` schema"""
+    with get_db() as conn:
+        voucharchive.attach(conn, ARCHIVE_PATH if ARCHIVE_ENABLED else ":memory:")
+        yield conn
+
+@contextmanager
+def archive_reader():
+    """storage_engine.reader() with the archive attached, for long scans and exports.
+
+    On the memory engine this is a private copy, so a scan doesn't hold the
+    lock every db_execute on the event loop waits on.
+    """
+    with storage_engine.reader() as conn:
+        voucharchive.attach(conn, ARCHIVE_PATH if ARCHIVE_ENABLED else ":memory:")
+        yield conn
+
+@contextmanager
+def db_transaction(archive=False):
+    """get_db() (or get_archive_db()) wrapped in BEGIN IMMEDIATE ... COMMIT.
+
+    If the block raises, the engine rolls the whole transaction back, so a
+    count change and its vouch_events row are written together or not at all.
+    """
+    with (get_archive_db() if archive else get_db()) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.execute("COMMIT")
 
 def init_db():
     with get_db() as conn:
+        # Let archival hand freed pages back; existing databases need one VACUUM to switch
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
         conn.execute("""
         CREATE TABLE IF NOT EXISTS vouches (
             user_id INTEGER PRIMARY KEY,
@@ -89,13 +214,124 @@ def init_db():
         CREATE INDEX IF NOT EXISTS idx_vouch_timestamp 
         ON vouch_records(timestamp)
         """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS vouch_daily (
+            day INTEGER PRIMARY KEY,
+            vouches INTEGER DEFAULT 0,
+            new_tracked INTEGER DEFAULT 0
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS voucher_daily (
+            day INTEGER,
+            voucher_id INTEGER,
+            vouches INTEGER DEFAULT 0,
+            PRIMARY KEY (day, voucher_id)
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS vouch_events (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT,
+            actor_id INTEGER,
+            user_id INTEGER,
+            value INTEGER,
+            timestamp INTEGER
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS vouch_snapshots (
+            seq INTEGER PRIMARY KEY,
+            created_at INTEGER
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS vouch_snapshot_counts (
+            seq INTEGER,
+            user_id INTEGER,
+            vouch_count INTEGER,
+            unvouchable INTEGER,
+            PRIMARY KEY (seq, user_id)
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS dm_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            payload TEXT,
+            attempts INTEGER DEFAULT 0,
+            next_attempt INTEGER DEFAULT 0,
+            created_at INTEGER
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS dm_closed_users (
+            user_id INTEGER PRIMARY KEY,
+            marked_at INTEGER
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS discrepancy_notifications (
+            message_id INTEGER PRIMARY KEY,
+            admin_id INTEGER,
+            member_id INTEGER,
+            timestamp INTEGER,
+            expires_at INTEGER
+        )
+        """)
+        conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notification_expiry
+        ON discrepancy_notifications(expires_at)
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT,
+            guild_id INTEGER,
+            actor_id INTEGER,
+            channel_id INTEGER,
+            message_id INTEGER,
+            status TEXT,
+            cursor INTEGER DEFAULT 0,
+            processed INTEGER DEFAULT 0,
+            changed INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            total INTEGER DEFAULT 0,
+            created_at INTEGER,
+            updated_at INTEGER
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS vouch_archive_counts (
+            vouched_id INTEGER PRIMARY KEY,
+            archived INTEGER DEFAULT 0
+        )
+        """)
+    if ARCHIVE_ENABLED:
+        with get_archive_db():
+            pass
+
+def log_phase(name, started):
+    """Record how long a startup phase took (first occurrence only)"""
+    if name in bot.startup_phases:
+        return
+    bot.startup_phases[name] = elapsed = time.perf_counter() - started
+    print(f"[startup] {name}: {elapsed:.2f}s")
 
+log_phase("import", STARTUP_STARTED)
+db_started = time.perf_counter()
+storage_engine = storage.create_engine(STORAGE_ENGINE, DB_PATH, snapshot_interval=SNAPSHOT_INTERVAL)
 init_db()
+if storage_engine.name == "memory" and ARCHIVE_ENABLED:
+    with get_archive_db() as conn:
+        if removed := voucharchive.drop_hot_duplicates(conn):
+            print(f"Removed {removed} rows already archived before the last snapshot")
+log_phase("db_init", db_started)
 
 # Database operations with error handling
 def db_execute(query, params=()):
     try:
-        with get_db() as conn:
+        with tracer.span("db.query", {"db.statement": query.strip()[:500]}), storage_engine.connection() as conn:
             conn.execute(query, params)
         return True
     except sqlite3.Error as e:
@@ -104,18 +340,363 @@ def db_execute(query, params=()):
 
 def db_fetchone(query, params=()):
     try:
-        with get_db() as conn:
+        with tracer.span("db.query", {"db.statement": query.strip()[:500]}), storage_engine.connection() as conn:
             return conn.execute(query, params).fetchone()
     except sqlite3.Error:
         return None
 
 def db_fetchall(query, params=()):
     try:
-        with get_db() as conn:
+        with tracer.span("db.query", {"db.statement": query.strip()[:500]}), storage_engine.connection() as conn:
             return conn.execute(query, params).fetchall()
     except sqlite3.Error:
         return []
 
+class NotificationStore:
+    """Admin alert messages awaiting a ✅/❌ reaction, persisted across restarts.
+
+    Lookups hit an in-memory dict; a min-heap keyed on expiry makes purging
+    O(log n) per entry. Once more than NOTIFICATION_CACHE_LIMIT alerts are
+    pending, the soonest-expiring ones are only kept on disk.
+    """
+
+    def __init__(self, ttl=NOTIFICATION_TTL, cache_limit=NOTIFICATION_CACHE_LIMIT):
+        self.ttl = ttl
+        self.cache_limit = cache_limit
+        self._cache = {}  # message_id -> data
+        self._expiry_heap = []  # (expires_at, message_id), lazily invalidated
+        self._spilled = False  # True once some pending alerts live only on disk
+
+    def load(self):
+        """Reload unexpired notifications after a restart"""
+        rows = db_fetchall("""
+            SELECT message_id, admin_id, member_id, timestamp, expires_at
+            FROM discrepancy_notifications
+            WHERE expires_at > ?
+            ORDER BY expires_at DESC
+            """, (int(time.time()),))
+        for row in rows:
+            self._remember(row['message_id'], dict(row))
+
+    def _remember(self, message_id, data):
+        self._cache[message_id] = data
+        heapq.heappush(self._expiry_heap, (data['expires_at'], message_id))
+        while len(self._cache) > self.cache_limit and self._expiry_heap:
+            expires_at, old_id = heapq.heappop(self._expiry_heap)
+            old = self._cache.get(old_id)
+            if old and old['expires_at'] == expires_at:
+                del self._cache[old_id]
+                self._spilled = True
+
+    def add(self, message_id, admin_id, member_id):
+        now = int(time.time())
+        data = {
+            'message_id': message_id,
+            'admin_id': admin_id,
+            'member_id': member_id,
+            'timestamp': now,
+            'expires_at': now + self.ttl,
+        }
+        db_execute("""
+            INSERT OR REPLACE INTO discrepancy_notifications VALUES (?, ?, ?, ?, ?)
+            """, (message_id, admin_id, member_id, now, now + self.ttl))
+        self._remember(message_id, data)
+
+    def get(self, message_id):
+        data = self._cache.get(message_id)
+        if data is None and self._spilled:
+            row = db_fetchone("""
+                SELECT message_id, admin_id, member_id, timestamp, expires_at
+                FROM discrepancy_notifications WHERE message_id = ?
+                """, (message_id,))
+            data = dict(row) if row else None
+        if data is None or data['expires_at'] <= time.time():
+            return None
+        return data
+
+    def remove(self, message_id):
+        self._cache.pop(message_id, None)
+        db_execute("DELETE FROM discrepancy_notifications WHERE message_id = ?", (message_id,))
+
+    def purge_expired(self):
+        now = int(time.time())
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, message_id = heapq.heappop(self._expiry_heap)
+            data = self._cache.get(message_id)
+            if data and data['expires_at'] == expires_at:
+                del self._cache[message_id]
+        db_execute("DELETE FROM discrepancy_notifications WHERE expires_at <= ?", (now,))
+        if self._spilled and not db_fetchone(
+                "SELECT 1 FROM discrepancy_notifications LIMIT 1 OFFSET ?", (len(self._cache),)):
+            self._spilled = False
+
+    def __len__(self):
+        return len(self._cache)
+
+bot.discrepancy_notifications = NotificationStore()
+
+class MemberLocks:
+    """Serializes changes to the same member without a global lock.
+
+    Member ids map onto a fixed pool of asyncio locks, so memory stays flat no
+    matter how many members there are; two members only wait on each other if
+    they share a stripe. Locks are not reentrant, so hold them around the
+    command body and never inside helpers like update_nickname.
+    """
+
+    def __init__(self, stripes=MEMBER_LOCK_STRIPES):
+        self._locks = [asyncio.Lock() for _ in range(stripes)]
+        self.acquired = 0
+        self.contended = 0  # Acquisitions that had to wait
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hot_members = {}  # member_id -> times someone waited on them
+
+    def _stripe(self, member_id):
+        return member_id % len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, *member_ids):
+        """Lock every given member; stripes are taken in order so pairs can't deadlock"""
+        held = []
+        try:
+            for stripe in sorted({self._stripe(m) for m in member_ids}):
+                lock = self._locks[stripe]
+                if lock.locked():
+                    started = time.perf_counter()
+                    with tracer.span("member_lock.wait", {"lock.stripe": stripe}):
+                        await lock.acquire()
+                    self._record_wait(time.perf_counter() - started,
+                                      [m for m in member_ids if self._stripe(m) == stripe])
+                else:
+                    await lock.acquire()
+                held.append(lock)
+                self.acquired += 1
+            yield
+        finally:
+            for lock in reversed(held):
+                lock.release()
+
+    def _record_wait(self, waited, member_ids):
+        self.contended += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        for member_id in member_ids:
+            self.hot_members[member_id] = self.hot_members.get(member_id, 0) + 1
+        if len(self.hot_members) > LOCK_HOT_MEMBERS:
+            keep = heapq.nlargest(LOCK_HOT_MEMBERS // 2, self.hot_members.items(), key=lambda i: i[1])
+            self.hot_members = dict(keep)
+
+    def stats(self, top=10):
+        return {
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "held": sum(lock.locked() for lock in self._locks),
+            "wait_avg": self.wait_total / self.contended if self.contended else 0.0,
+            "wait_max": self.wait_max,
+            "hot_members": heapq.nlargest(top, self.hot_members.items(), key=lambda i: i[1]),
+        }
+
+    def reset_stats(self):
+        self.acquired = self.contended = 0
+        self.wait_total = self.wait_max = 0.0
+        self.hot_members = {}
+
+bot.member_locks = MemberLocks()
+
+# Vouch event log: every count/unvouchable change is appended here so the
+# vouches table can be rebuilt deterministically from the last snapshot
+def record_event(kind, actor_id, user_id=None, value=None, conn=None):
+    params = (kind, actor_id, user_id, value, int(time.time()))
+    query = """
+        INSERT INTO vouch_events (kind, actor_id, user_id, value, timestamp)
+        VALUES (?, ?, ?, ?, ?)
+        """
+    if conn is not None:
+        conn.execute(query, params)
+        return True
+    return db_execute(query, params)
+
+def apply_event(counts, unvouchable, kind, user_id, value):
+    if kind == "vouch":
+        counts[user_id] = counts.get(user_id, 0) + 1
+    elif kind == "set":
+        counts[user_id] = value
+    elif kind == "clear":
+        counts[user_id] = 0
+    elif kind == "clear_all":
+        counts.clear()
+    elif kind == "unvouchable":
+        if value:
+            unvouchable.add(user_id)
+        else:
+            unvouchable.discard(user_id)
+
+def replay_vouch_events(conn=None):
+    """Stream the latest snapshot plus newer events into (counts, unvouchable, last_seq).
+
+    Pass conn to replay inside the caller's transaction.
+    """
+    if conn is None:
+        with get_db() as conn:
+            return replay_vouch_events(conn)
+    counts = {}
+    unvouchable = set()
+    last_seq = conn.execute("SELECT MAX(seq) FROM vouch_snapshots").fetchone()[0] or 0
+    for row in conn.execute("""
+            SELECT user_id, vouch_count, unvouchable
+            FROM vouch_snapshot_counts WHERE seq = ?
+            """, (last_seq,)):
+        if row['vouch_count']:
+            counts[row['user_id']] = row['vouch_count']
+        if row['unvouchable']:
+            unvouchable.add(row['user_id'])
+    for row in conn.execute("""
+            SELECT seq, kind, user_id, value FROM vouch_events
+            WHERE seq > ? ORDER BY seq
+            """, (last_seq,)):
+        apply_event(counts, unvouchable, row['kind'], row['user_id'], row['value'])
+        last_seq = row['seq']
+    return counts, unvouchable, last_seq
+
+def write_snapshot(conn, seq, counts, unvouchable):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("INSERT OR REPLACE INTO vouch_snapshots VALUES (?, ?)", (seq, int(time.time())))
+        conn.executemany("""
+            INSERT OR REPLACE INTO vouch_snapshot_counts VALUES (?, ?, ?, ?)
+            """, ((seq, user_id, counts.get(user_id, 0), int(user_id in unvouchable))
+                  for user_id in set(counts) | unvouchable
+                  if counts.get(user_id) or user_id in unvouchable))
+        # Only the newest snapshot is ever replayed from
+        conn.execute("DELETE FROM vouch_snapshot_counts WHERE seq < ?", (seq,))
+        conn.execute("DELETE FROM vouch_snapshots WHERE seq < ?", (seq,))
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        conn.execute("ROLLBACK")
+        raise
+
+def apply_vouch_replay():
+    """Overwrite vouches/unvouchable_users with the replayed log; returns (changed user ids, last seq)
+
+    The replay and the write share one transaction, so a vouch committed
+    meanwhile can't be overwritten with a stale count.
+    """
+    with db_transaction() as conn:
+        counts, unvouchable, last_seq = replay_vouch_events(conn)
+        current = {row[0]: row[1] for row in conn.execute("SELECT user_id, vouch_count FROM vouches")}
+        current_unvouchable = {row[0] for row in conn.execute("SELECT user_id FROM unvouchable_users")}
+        changed = {user_id for user_id in set(current) | set(counts)
+                   if current.get(user_id, 0) != counts.get(user_id, 0)}
+        changed |= current_unvouchable ^ unvouchable
+
+        conn.executemany("""
+            INSERT INTO vouches (user_id, vouch_count) VALUES (?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET vouch_count = excluded.vouch_count
+            """, ((user_id, counts.get(user_id, 0)) for user_id in changed))
+        conn.executemany("DELETE FROM unvouchable_users WHERE user_id = ?",
+                         ((user_id,) for user_id in current_unvouchable - unvouchable))
+        conn.executemany("INSERT OR IGNORE INTO unvouchable_users VALUES (?)",
+                         ((user_id,) for user_id in unvouchable - current_unvouchable))
+    return changed, last_seq
+
+def take_vouch_snapshot():
+    """Compact the event log into a snapshot if anything changed since the last one"""
+    try:
+        counts, unvouchable, last_seq = replay_vouch_events()
+        with get_db() as conn:
+            if conn.execute("SELECT 1 FROM vouch_snapshots WHERE seq = ?", (last_seq,)).fetchone():
+                return False
+            write_snapshot(conn, last_seq, counts, unvouchable)
+        return True
+    except sqlite3.Error as e:
+        print(f"Snapshot error: {e}")
+        return False
+
+def ensure_event_baseline():
+    """Seed the log with the pre-existing vouches table on first run"""
+    with get_db() as conn:
+        if conn.execute("SELECT 1 FROM vouch_snapshots LIMIT 1").fetchone():
+            return
+        if conn.execute("SELECT 1 FROM vouch_events LIMIT 1").fetchone():
+            return
+        counts = {row[0]: row[1] for row in conn.execute(
+            "SELECT user_id, vouch_count FROM vouches WHERE vouch_count > 0")}
+        unvouchable = {row[0] for row in conn.execute("SELECT user_id FROM unvouchable_users")}
+        write_snapshot(conn, 0, counts, unvouchable)
+
+# Activity rollups: per-day counters kept up to date on every vouch so
+# analytics cost O(days) instead of scanning vouch_records
+def rollup_vouch(voucher_id, timestamp, conn=None):
+    if conn is None:
+        with get_db() as conn:
+            return rollup_vouch(voucher_id, timestamp, conn)
+    day = int(timestamp) // 86400
+    conn.execute("""
+        INSERT INTO vouch_daily (day, vouches) VALUES (?, 1)
+        ON CONFLICT(day) DO UPDATE SET vouches = vouches + 1
+        """, (day,))
+    conn.execute("""
+        INSERT INTO voucher_daily VALUES (?, ?, 1)
+        ON CONFLICT(day, voucher_id) DO UPDATE SET vouches = vouches + 1
+        """, (day, voucher_id))
+
+def rollup_new_tracked(timestamp, count=1):
+    db_execute("""
+        INSERT INTO vouch_daily (day, new_tracked) VALUES (?, ?)
+        ON CONFLICT(day) DO UPDATE SET new_tracked = new_tracked + ?
+        """, (int(timestamp) // 86400, count, count))
+
+def backfill_rollups():
+    """Build vouch rollups from existing records when they're missing (first run, after an import)"""
+    if db_fetchone("SELECT 1 FROM voucher_daily LIMIT 1"):
+        return
+    # Vouches from now on are rolled up as they happen, the scan covers the ones before
+    cutoff = int(time.time())
+    with archive_reader() as conn:
+        totals = conn.execute("""
+            SELECT timestamp / 86400, voucher_id, COUNT(*)
+            FROM (SELECT voucher_id, timestamp FROM main.vouch_records
+                  UNION ALL SELECT voucher_id, timestamp FROM archive.vouch_records)
+            WHERE timestamp > 0 AND timestamp < ? GROUP BY timestamp / 86400, voucher_id
+            """, (cutoff,)).fetchall()
+    with db_transaction() as conn:
+        conn.executemany("""
+            INSERT INTO voucher_daily VALUES (?, ?, ?)
+            ON CONFLICT(day, voucher_id) DO UPDATE SET vouches = vouches + excluded.vouches
+            """, totals)
+        conn.execute("""
+            INSERT INTO vouch_daily (day, vouches)
+            SELECT day, SUM(vouches) FROM voucher_daily WHERE true GROUP BY day
+            ON CONFLICT(day) DO UPDATE SET vouches = excluded.vouches
+            """)
+
+def vouch_activity(days=30, bucket="day", top=5):
+    """Vouch counts, new tracked users and top vouchers over the last `days`"""
+    start_day = int(time.time()) // 86400 - days + 1
+    # Epoch day 0 was a Thursday, shift by 3 so weeks start on Monday
+    bucket_expr = "day" if bucket == "day" else "(day + 3) / 7 * 7 - 3"
+    rows = db_fetchall(f"""
+        SELECT {bucket_expr} AS bucket, SUM(vouches) AS vouches, SUM(new_tracked) AS new_tracked
+        FROM vouch_daily WHERE day >= ?
+        GROUP BY bucket ORDER BY bucket
+        """, (start_day,))
+    top_vouchers = db_fetchall("""
+        SELECT voucher_id, SUM(vouches) AS vouches
+        FROM voucher_daily WHERE day >= ?
+        GROUP BY voucher_id ORDER BY vouches DESC LIMIT ?
+        """, (start_day, top))
+    return {
+        "days": days,
+        "bucket": bucket,
+        "series": [{
+            "start": (datetime.date(1970, 1, 1) + datetime.timedelta(days=row['bucket'])).isoformat(),
+            "vouches": row['vouches'],
+            "new_tracked": row['new_tracked'],
+        } for row in rows],
+        "top_vouchers": [{"user_id": row['voucher_id'], "vouches": row['vouches']} for row in top_vouchers],
+    }
+
 # Core functions
 def is_admin(ctx):
     admin_roles = ["Admin"]
@@ -142,120 +723,748 @@ def clean_nickname(nick):
         return str(nick).replace("[", "").replace("]", "").replace("［", "").replace("］", "").strip()
 
 
+# Member state cache: read-through until warmup has bulk-loaded every row,
+# after which a missing user simply has no vouch data
+def refresh_member_state(user_id):
+    """Re-read one user's state; call after any write to their vouches row"""
+    row = db_fetchone("""
+        SELECT
+            (SELECT vouch_count FROM vouches WHERE user_id = ?),
+            (SELECT tracking_enabled FROM vouches WHERE user_id = ?),
+            EXISTS(SELECT 1 FROM unvouchable_users WHERE user_id = ?)
+        """, (user_id, user_id, user_id))
+    if row is None:
+        bot.member_state.pop(user_id, None)
+        return (0, False, False)
+    state = (row[0] or 0, row[1] == 1, bool(row[2]))
+    bot.member_state[user_id] = state
+    return state
+
+def get_member_state(user_id):
+    state = bot.member_state.get(user_id)
+    if state is None:
+        if bot.member_state_complete:
+            return (0, False, False)
+        state = refresh_member_state(user_id)
+    return state
+
+def scan_member_state(conn):
+    """One pass over vouches and unvouchable_users"""
+    unvouchable = {row[0] for row in conn.execute("SELECT user_id FROM unvouchable_users")}
+    state = {row[0]: (row[1] or 0, row[2] == 1, row[0] in unvouchable)
+             for row in conn.execute("SELECT user_id, vouch_count, tracking_enabled FROM vouches")}
+    for user_id in unvouchable - state.keys():
+        state[user_id] = (0, False, True)
+    return state
+
+def scan_cooldowns(conn):
+    return {row[0]: row[1] for row in conn.execute("SELECT user_id, last_vouch_time FROM vouch_cooldowns")}
+
+def scan_warm_state():
+    """Member state and cooldowns from one reader, off the engine lock"""
+    with storage_engine.reader() as conn:
+        return scan_member_state(conn), scan_cooldowns(conn)
+
+async def warm_member_state():
+    generation = bot.member_state_generation
+    state, cooldowns = await asyncio.to_thread(scan_warm_state)
+    if generation != bot.member_state_generation:
+        # A reload ran meanwhile, this scan may predate it and its own warm-up will install
+        return
+    # Entries refreshed while the scan ran are newer than the scan
+    state.update(bot.member_state)
+    bot.member_state = state
+    bot.member_state_complete = True
+    # Cooldown rows are written with every cached change, so the table wins
+    bot.cooldowns = {**bot.cooldowns, **cooldowns}
+    bot.cooldowns_complete = True
+
+def reload_member_state():
+    """Drop cached state after bulk rewrites and rebuild it in the background"""
+    bot.member_state_generation += 1
+    bot.member_state = {}
+    bot.member_state_complete = False
+    bot.cooldowns = {}
+    bot.cooldowns_complete = False
+    bot.loop.create_task(warm_member_state())
+
+def get_last_vouch_time(user_id):
+    if user_id in bot.cooldowns or bot.cooldowns_complete:
+        return bot.cooldowns.get(user_id)
+    row = db_fetchone("SELECT last_vouch_time FROM vouch_cooldowns WHERE user_id = ?", (user_id,))
+    bot.cooldowns[user_id] = row[0] if row else None
+    return bot.cooldowns[user_id]
+
 def get_vouches(user_id):
-    row = db_fetchone("SELECT vouch_count FROM vouches WHERE user_id = ?", (user_id,))
-    return row[0] if row else 0
+    return get_member_state(user_id)[0]
 
 def is_tracking_enabled(user_id):
-    row = db_fetchone("SELECT tracking_enabled FROM vouches WHERE user_id = ?", (user_id,))
-    return row and row[0] == 1
+    return get_member_state(user_id)[1]
 
 def is_unvouchable(user_id):
-    row = db_fetchone("SELECT 1 FROM unvouchable_users WHERE user_id = ?", (user_id,))
-    return row is not None
+    return get_member_state(user_id)[2]
 
 def has_vouched(voucher_id, vouched_id):
     row = db_fetchone("SELECT 1 FROM vouch_records WHERE voucher_id = ? AND vouched_id = ?", (voucher_id, vouched_id))
-    return row is not None
+    if row is not None:
+        return True
+    # Only open the archive for users who have archived records
+    if not db_fetchone("SELECT 1 FROM vouch_archive_counts WHERE vouched_id = ?", (vouched_id,)):
+        return False
+    with get_archive_db() as conn:
+        return voucharchive.has_record(conn, voucher_id, vouched_id)
+
+def count_vouch_records(user_id):
+    """Distinct vouchers for a user across the hot table and the archive"""
+    if not db_fetchone("SELECT 1 FROM vouch_archive_counts WHERE vouched_id = ?", (user_id,)):
+        return db_fetchone("SELECT COUNT(*) FROM vouch_records WHERE vouched_id = ?", (user_id,))[0]
+    # A pair can sit in both tiers if it was re-added after archival, UNION counts it once
+    with get_archive_db() as conn:
+        return conn.execute("""
+            SELECT COUNT(*) FROM (
+                SELECT voucher_id FROM main.vouch_records WHERE vouched_id = ?
+                UNION SELECT voucher_id FROM archive.vouch_records WHERE vouched_id = ?)
+            """, (user_id, user_id)).fetchone()[0]
+
+def archive_old_vouches(max_age_days=RETENTION_DAYS):
+    """Move records and reasons older than max_age_days to the archive; returns (records, reasons)"""
+    cutoff = int(time.time()) - max_age_days * 86400
+    moved_records = moved_reasons = 0
+    while True:
+        # A connection per batch so the memory engine's lock is released in between
+        with get_archive_db() as conn:
+            records, reasons = voucharchive.archive_batch(conn, cutoff, int(time.time()))
+            if records or reasons:
+                conn.execute("PRAGMA main.incremental_vacuum")
+        moved_records += records
+        moved_reasons += reasons
+        if records < voucharchive.MOVE_BATCH and reasons < voucharchive.MOVE_BATCH:
+            break
+    if moved_records or moved_reasons:
+        # The archive side is already on disk, persist the hot deletes to match
+        storage_engine.snapshot()
+    return moved_records, moved_reasons
 
 # Add this with your other utility functions (around line 100)
 async def clean_old_notifications():
     """Clean up old notification records"""
     while True:
         await asyncio.sleep(3600)  # Every hour
-        current_time = time.time()
-        to_delete = []
-        
-        for msg_id, data in bot.discrepancy_notifications.items():
-            if current_time - data.get('timestamp', 0) > 86400:  # 24 hours
-                to_delete.append(msg_id)
+        bot.discrepancy_notifications.purge_expired()
+        await asyncio.to_thread(take_vouch_snapshot)
+        prune_recent_alerts()
+        db_execute("DELETE FROM jobs WHERE status NOT IN ('queued', 'running') AND updated_at < ?",
+                   (int(time.time()) - JOB_HISTORY,))
+        if RETENTION_DAYS:
+            try:
+                await asyncio.to_thread(archive_old_vouches)
+            except sqlite3.Error as e:
+                print(f"Vouch archival failed: {str(e)}")
+
+def dms_closed(user_id):
+    marked_at = bot.dm_closed.get(user_id)
+    return marked_at is not None and time.time() - marked_at < DM_CLOSED_RECHECK
+
+def enqueue_dm(user_id, content=None, embed=None):
+    """Queue a DM for background delivery; returns False if it won't be sent"""
+    if dms_closed(user_id):
+        return False
+    payload = json.dumps({
+        'content': content,
+        'embed': embed.to_dict() if embed else None,
+    })
+    try:
+        with get_db() as conn:
+            outbox_id = conn.execute("""
+                INSERT INTO dm_outbox (user_id, payload, created_at) VALUES (?, ?, ?)
+                """, (user_id, payload, int(time.time()))).lastrowid
+    except sqlite3.Error as e:
+        print(f"Outbox error: {e}")
+        return False
+    bot.outbox_queue.put_nowait(outbox_id)
+    return True
+
+def load_outbox():
+    """Requeue undelivered DMs left over from before a restart"""
+    for row in db_fetchall("SELECT user_id, marked_at FROM dm_closed_users"):
+        bot.dm_closed[row['user_id']] = row['marked_at']
+    now = time.time()
+    for row in db_fetchall("SELECT id, next_attempt FROM dm_outbox ORDER BY id"):
+        delay = max(0, row['next_attempt'] - now)
+        bot.loop.call_later(delay, bot.outbox_queue.put_nowait, row['id'])
+
+async def deliver_dm(outbox_id):
+    row = db_fetchone("SELECT user_id, payload, attempts FROM dm_outbox WHERE id = ?", (outbox_id,))
+    if not row:
+        return
+    if dms_closed(row['user_id']):
+        db_execute("DELETE FROM dm_outbox WHERE id = ?", (outbox_id,))
+        return
+
+    payload = json.loads(row['payload'])
+    try:
+        user = bot.get_user(row['user_id']) or await bot.fetch_user(row['user_id'])
+        await user.send(
+            content=payload['content'],
+            embed=discord.Embed.from_dict(payload['embed']) if payload['embed'] else None
+        )
+        db_execute("DELETE FROM dm_outbox WHERE id = ?", (outbox_id,))
+    except discord.Forbidden:
+        # DMs closed or bot blocked, remember so we stop trying
+        now = int(time.time())
+        bot.dm_closed[row['user_id']] = now
+        db_execute("""
+            INSERT OR REPLACE INTO dm_closed_users VALUES (?, ?)
+            """, (row['user_id'], now))
+        db_execute("DELETE FROM dm_outbox WHERE id = ?", (outbox_id,))
+    except (discord.HTTPException, asyncio.TimeoutError, OSError) as e:
+        attempts = row['attempts'] + 1
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            print(f"Giving up on DM to {row['user_id']}: {e}")
+            db_execute("DELETE FROM dm_outbox WHERE id = ?", (outbox_id,))
+            return
+        delay = OUTBOX_BACKOFF * 2 ** (attempts - 1)
+        db_execute("""
+            UPDATE dm_outbox SET attempts = ?, next_attempt = ? WHERE id = ?
+            """, (attempts, int(time.time() + delay), outbox_id))
+        bot.loop.call_later(delay, bot.outbox_queue.put_nowait, outbox_id)
+
+async def outbox_worker():
+    while True:
+        outbox_id = await bot.outbox_queue.get()
+        try:
+            await deliver_dm(outbox_id)
+        except Exception as e:
+            print(f"Outbox delivery error: {e}")
+        finally:
+            bot.outbox_queue.task_done()
+
+def start_outbox():
+    if bot.outbox_workers:
+        return
+    load_outbox()
+    bot.outbox_workers = [bot.loop.create_task(outbox_worker()) for _ in range(OUTBOX_WORKERS)]
+
+# Background sweeps: each job kind lists the ids left to process after the
+# job's cursor in ascending order and handles them one at a time, persisting
+# the cursor every JOB_CHECKPOINT items so a restart resumes where it
+# stopped. Steps must be idempotent since a few items get redone on resume.
+def guild_member_ids(guild, cursor, predicate=lambda member: True):
+    return sorted(m.id for m in guild.members if m.id > cursor and predicate(m))
+
+async def fixnicks_step(job, guild, member_id):
+    member = guild.get_member(member_id)
+    if member is None or not is_tracking_enabled(member_id):
+        return 0
+    async with bot.member_locks.hold(member_id):
+        # First completely clean the nickname, then properly update with tags
+        await member.edit(nick=clean_nickname(member.display_name))
+        await update_nickname(member)
+    await asyncio.sleep(0.5)  # Rate limiting
+    return 1
+
+async def enable_tracking_step(job, guild, member_id):
+    member = guild.get_member(member_id)
+    if member is None or is_tracking_enabled(member_id):
+        return 0
+    async with bot.member_locks.hold(member_id):
+        if not db_execute("""
+        INSERT INTO vouches (user_id, tracking_enabled) VALUES (?, 1)
+        ON CONFLICT(user_id) DO UPDATE SET tracking_enabled = 1
+        """, (member_id,)):
+            raise sqlite3.OperationalError("tracking update failed")
+        refresh_member_state(member_id)
+        rollup_new_tracked(time.time())
+        await update_nickname(member)
+    return 1
+
+async def disable_tracking_step(job, guild, member_id):
+    member = guild.get_member(member_id)
+    if member is None or not is_tracking_enabled(member_id):
+        return 0
+    async with bot.member_locks.hold(member_id):
+        if not db_execute("UPDATE vouches SET tracking_enabled = 0 WHERE user_id = ?", (member_id,)):
+            raise sqlite3.OperationalError("tracking update failed")
+        refresh_member_state(member_id)
+        await update_nickname(member)
+    return 1
+
+async def refresh_nickname_step(job, guild, member_id):
+    member = guild.get_member(member_id)
+    if member is None or not is_tracking_enabled(member_id):
+        return 0
+    async with bot.member_locks.hold(member_id):
+        await update_nickname(member)
+    return 1
+
+def reconcile_ids(job, guild):
+    rows = db_fetchall("SELECT user_id FROM vouches WHERE vouch_count > 0 AND user_id > ? ORDER BY user_id",
+                       (job['cursor'],))
+    return [row['user_id'] for row in rows]
+
+async def reconcile_step(job, guild, user_id):
+    async with bot.member_locks.hold(user_id):
+        needed = get_vouches(user_id) - count_vouch_records(user_id)
+        # A pair already archived would otherwise be re-added to the hot table
+        if needed <= 0 or has_vouched(job['actor_id'], user_id):
+            return 0
+        # Errors propagate so run_job counts them as failed
+        with get_db() as conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO vouch_records (voucher_id, vouched_id) VALUES (?, ?)",
+                (job['actor_id'], user_id)).rowcount
+    # Only one record per (admin, user) pair can exist, report what was written
+    return inserted
+
+JOB_KINDS = {
+    "fixnicks": {
+        "label": "Nickname cleanup", "changed": "updated",
+        "items": lambda job, guild: guild_member_ids(guild, job['cursor'], lambda m: is_tracking_enabled(m.id)),
+        "step": fixnicks_step,
+    },
+    "enablevouches_all": {
+        "label": "Enable tracking for all", "changed": "enabled",
+        "items": lambda job, guild: guild_member_ids(guild, job['cursor'], lambda m: not is_tracking_enabled(m.id)),
+        "step": enable_tracking_step,
+    },
+    "disablevouches_all": {
+        "label": "Disable tracking for all", "changed": "disabled",
+        "items": lambda job, guild: guild_member_ids(guild, job['cursor'], lambda m: is_tracking_enabled(m.id)),
+        "step": disable_tracking_step,
+    },
+    "clearvouches_all": {
+        "label": "Nickname refresh after vouch reset", "changed": "updated",
+        "items": lambda job, guild: guild_member_ids(guild, job['cursor'], lambda m: is_tracking_enabled(m.id)),
+        "step": refresh_nickname_step,
+    },
+    "reconcile_vouches": {
+        "label": "Vouch record reconciliation", "changed": "records added",
+        "items": reconcile_ids,
+        "step": reconcile_step,
+        "finish": lambda job: invalidate_vouch_graph(),
+    },
+}
+
+JOB_ICONS = {"queued": "⏳", "running": "🔄", "done": "✅", "cancelled": "🛑", "failed": "❌"}
+
+def render_job(job):
+    kind = JOB_KINDS[job['kind']]
+    lines = [f"{JOB_ICONS[job['status']]} **Job #{job['id']}: {kind['label']}** ({job['status']})"]
+    if job['total']:
+        share = job['processed'] / job['total']
+        filled = int(share * 10)
+        lines.append(f"{'▓' * filled}{'░' * (10 - filled)} {share:.0%} ({job['processed']}/{job['total']})")
+    lines.append(f"• {kind['changed'].capitalize()}: {job['changed']}, failed: {job['failed']}")
+    elapsed = (job['updated_at'] if job['status'] in ("done", "cancelled", "failed") else time.time()) - job['created_at']
+    lines.append(f"⏱️ {int(elapsed) // 60}m {int(elapsed) % 60}s since queued")
+    if job['status'] in ("queued", "running"):
+        lines.append(f"Cancel with `job_cancel {job['id']}`")
+    return "\n".join(lines)
+
+def save_job(job):
+    job['updated_at'] = int(time.time())
+    db_execute("""
+        UPDATE jobs SET status = ?, cursor = ?, processed = ?, changed = ?, failed = ?, total = ?,
+                        channel_id = ?, message_id = ?, updated_at = ?
+        WHERE id = ?
+        """, (job['status'], job['cursor'], job['processed'], job['changed'], job['failed'], job['total'],
+              job['channel_id'], job['message_id'], job['updated_at'], job['id']))
+
+def load_job(job_id):
+    row = db_fetchone("SELECT * FROM jobs WHERE id = ?", (job_id,))
+    return dict(row) if row else None
+
+async def show_job(job):
+    """Edit the job's status message in place, reposting it if the edit fails"""
+    channel = bot.get_channel(job['channel_id']) if job['channel_id'] else None
+    if channel is None:
+        return
+    content = render_job(job)
+    if job['message_id']:
+        try:
+            await channel.get_partial_message(job['message_id']).edit(content=content)
+            return
+        except discord.HTTPException:
+            pass
+    try:
+        job['message_id'] = (await channel.send(content)).id
+    except discord.HTTPException:
+        job['channel_id'] = job['message_id'] = None
+    save_job(job)
+
+async def run_job(job):
+    kind = JOB_KINDS[job['kind']]
+    try:
+        async with bot.job_slots:
+            guild = bot.get_guild(job['guild_id'])
+            if guild is None:
+                raise RuntimeError(f"guild {job['guild_id']} is unavailable")
+            job['status'] = "running"
+            items = kind['items'](job, guild)
+            job['total'] = job['processed'] + len(items)
+            save_job(job)
+            await show_job(job)
+            last_shown = time.monotonic()
+            for done, item_id in enumerate(items, 1):
+                try:
+                    job['changed'] += await kind['step'](job, guild, item_id)
+                except (discord.HTTPException, sqlite3.Error) as e:
+                    job['failed'] += 1
+                    print(f"Job #{job['id']} {job['kind']} failed on {item_id}: {str(e)}")
+                job['cursor'] = item_id
+                job['processed'] += 1
+                if done % JOB_CHECKPOINT == 0:
+                    save_job(job)
+                if time.monotonic() - last_shown >= JOB_PROGRESS_INTERVAL:
+                    await show_job(job)
+                    last_shown = time.monotonic()
+                await asyncio.sleep(0)  # DB-only steps would otherwise hog the loop
+            if finish := kind.get('finish'):
+                finish(job)
+            job['status'] = "done"
+    except asyncio.CancelledError:
+        if job['id'] not in bot.job_cancels:
+            # Bot is shutting down, leave it running so the next start resumes it
+            save_job(job)
+            raise
+        job['status'] = "cancelled"
+    except Exception:
+        job['status'] = "failed"
+        print(f"Job #{job['id']} {job['kind']} error: {traceback.format_exc()}")
+    bot.jobs.pop(job['id'], None)
+    bot.job_cancels.discard(job['id'])
+    save_job(job)
+    await show_job(job)
+
+def start_job(job):
+    bot.jobs[job['id']] = job
+    job['task'] = bot.loop.create_task(run_job(job))
+
+def resume_jobs():
+    """Restart sweeps that were queued or running when the bot last stopped"""
+    for row in db_fetchall("SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY id"):
+        if row['id'] not in bot.jobs and row['kind'] in JOB_KINDS:
+            start_job(dict(row))
+
+async def respond_message(ctx, content):
+    """ctx.respond that returns the sent message for prefix and slash invocations"""
+    response = await ctx.respond(content)
+    if isinstance(response, discord.Interaction):
+        response = await response.original_response()
+    return response
+
+async def submit_job(ctx, kind):
+    """Queue a sweep for ctx.guild and post the status message it will keep editing"""
+    for job in bot.jobs.values():
+        if job['kind'] == kind and job['guild_id'] == ctx.guild.id:
+            return await ctx.respond(f"ℹ️ Job #{job['id']} is already running, see `job_status {job['id']}`")
+    now = int(time.time())
+    with get_db() as conn:
+        job_id = conn.execute("""
+            INSERT INTO jobs (kind, guild_id, actor_id, channel_id, status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, 'queued', ?, ?)
+            """, (kind, ctx.guild.id, ctx.author.id, ctx.channel.id, now, now)).lastrowid
+    job = load_job(job_id)
+    message = await respond_message(ctx, render_job(job))
+    job['message_id'] = getattr(message, "id", None)
+    save_job(job)
+    start_job(job)
+
+def load_vouch_graph():
+    with archive_reader() as conn:
+        cursor = conn.execute("""
+            SELECT voucher_id, vouched_id FROM main.vouch_records
+            UNION ALL SELECT voucher_id, vouched_id FROM archive.vouch_records
+            """)
+        return vouchgraph.VouchGraph((row[0], row[1]) for row in cursor)
+
+async def rebuild_vouch_graph():
+    while True:
+        generation = bot.vouch_graph_generation
+        graph = await asyncio.to_thread(load_vouch_graph)
+        if generation != bot.vouch_graph_generation:
+            # Invalidated mid-scan, the scan may still hold cleared edges
+            continue
+        pending, bot.vouch_graph_pending = bot.vouch_graph_pending, []
+        for guild, voucher, member in pending:
+            graph.add_edge(voucher.id, member.id)
+        bot.vouch_graph = graph
+        for guild, voucher, member in pending:
+            alert_vouch_patterns(graph, guild, voucher, member)
+        return graph
+
+def start_vouch_graph_rebuild():
+    """The running rebuild task, starting one if none is"""
+    if bot.vouch_graph_task is None or bot.vouch_graph_task.done():
+        bot.vouch_graph_task = bot.loop.create_task(rebuild_vouch_graph())
+    return bot.vouch_graph_task
+
+async def refresh_vouch_graph():
+    """Rebuild the vouch graph off the event loop, sharing any rebuild already running"""
+    return await asyncio.shield(start_vouch_graph_rebuild())
+
+def invalidate_vouch_graph():
+    """Call after vouch_records rows are deleted or bulk-rewritten"""
+    bot.vouch_graph = None
+    bot.vouch_graph_generation += 1
+    # Vouches buffered so far are in the table the next scan reads
+    bot.vouch_graph_pending = []
+    start_vouch_graph_rebuild()
+
+def check_vouch_patterns(guild, voucher, member):
+    """Add a new vouch to the graph and alert admins on ring-like patterns"""
+    graph = bot.vouch_graph
+    if graph is None:
+        # Replayed into the graph being rebuilt once it's installed
+        bot.vouch_graph_pending.append((guild, voucher, member))
+        return
+    if graph.add_edge(voucher.id, member.id):
+        alert_vouch_patterns(graph, guild, voucher, member)
+
+def alert_vouch_patterns(graph, guild, voucher, member):
+    if graph.is_reciprocal(voucher.id, member.id):
+        dispatch_admin_alert(guild, member,
+            f"🔁 Mutual Vouch\n"
+            f"{voucher.mention} and {member.mention} vouched for each other"
+        )
+    report = graph.inflow_report(member.id)
+    if graph.is_suspicious_inflow(report):
+        dispatch_admin_alert(guild, member,
+            f"🧦 Suspicious Vouch Inflow\n"
+            f"{report['throwaway']} of {report['vouchers']} vouchers have never vouched anyone else "
+            f"and have no vouches themselves"
+        )
+
+def build_nickname(member):
+    """Compute the nickname a tracked member should currently have"""
+    current_nick = member.display_name
+    
+    # More robust cleaning with fallbacks
+    base_name = clean_nickname(current_nick)
+    
+    # Double-check cleaning worked
+    if (not base_name.strip() or 
+        any(bracket in base_name for bracket in ["[", "]", "［", "］"])):
+        base_name = member.name  # Fallback to pure username
         
-        for msg_id in to_delete:
-            del bot.discrepancy_notifications[msg_id]
+    # Final sanitization
+    base_name = base_name.replace("[", "").replace("]", "").replace("［", "").replace("］", "").strip()
+    if not base_name:  # Ultimate fallback
+        base_name = member.name
+
+    # Build new tags
+    new_tags = []
+    vouches = get_vouches(member.id)
+    if vouches > 0:
+        new_tags.append(f"{vouches}V")
+    if is_unvouchable(member.id):
+        new_tags.append("unvouchable")
+
+    # Construct new nickname
+    new_nick = f"{base_name} [{', '.join(new_tags)}]" if new_tags else base_name
+    new_nick = new_nick.replace("[", "［").replace("]", "］")[:32]
+
+    # Verify no duplicate tags
+    if "[" in new_nick and new_nick.count("[") > 1:
+        new_nick = f"{base_name} [{new_tags[-1]}]"  # Use only the last tag
+
+    return new_nick
 
 async def update_nickname(member):
     """Atomic nickname update with verification"""
     try:
         if not is_tracking_enabled(member.id):
+            # Drop leftover tags so the sync doesn't flag them as forged later
+            if VOUCH_TAG_PATTERN.search(member.display_name):
+                base_name = clean_nickname(member.display_name) or member.name
+                bot.expected_nicks[member.id] = base_name
+                await member.edit(nick=base_name)
+            else:
+                bot.expected_nicks.pop(member.id, None)
             return
-    
-        current_nick = member.display_name
-        
-        # More robust cleaning with fallbacks
-        base_name = clean_nickname(current_nick)
-        
-        # Double-check cleaning worked
-        if (not base_name.strip() or 
-            any(bracket in base_name for bracket in ["[", "]", "［", "］"])):
-            base_name = member.name  # Fallback to pure username
-            
-        # Final sanitization
-        base_name = base_name.replace("[", "").replace("]", "").replace("［", "").replace("］", "").strip()
-        if not base_name:  # Ultimate fallback
-            base_name = member.name
-
-        # Build new tags
-        new_tags = []
-        vouches = get_vouches(member.id)
-        if vouches > 0:
-            new_tags.append(f"{vouches}V")
-        if is_unvouchable(member.id):
-            new_tags.append("unvouchable")
-
-        # Construct new nickname
-        new_nick = f"{base_name} [{', '.join(new_tags)}]" if new_tags else base_name
-        new_nick = new_nick.replace("[", "［").replace("]", "］")[:32]
-
-        # Verify no duplicate tags
-        if "[" in new_nick and new_nick.count("[") > 1:
-            new_nick = f"{base_name} [{new_tags[-1]}]"  # Use only the last tag
-
-        if new_nick != current_nick:
+
+        new_nick = build_nickname(member)
+        bot.expected_nicks[member.id] = new_nick
+        if new_nick != member.display_name:
             await member.edit(nick=new_nick)
             
     except Exception as e:
         print(f"Nickname update failed for {member.display_name}: {str(e)}")
+
+async def sync_member_nickname(member):
+    """Debounced single-member check: fix drifted tags or flag forged ones"""
+    try:
+        await asyncio.sleep(NICK_SYNC_DEBOUNCE)
+    except asyncio.CancelledError:
+        return
+    bot.nick_sync_tasks.pop(member.id, None)
+
+    # Use the freshest member state after the debounce window
+    member = member.guild.get_member(member.id) or member
+    if member.display_name == bot.expected_nicks.get(member.id):
+        return
+
+    try:
+        if is_tracking_enabled(member.id):
+            async with bot.member_locks.hold(member.id):
+                await update_nickname(member)
+        elif match := VOUCH_TAG_PATTERN.search(member.display_name):
+            dispatch_admin_alert(member.guild, member,
+                f"⚠️ Fake Tags Detected\n"
+                f"Shows: {match.group(1)}V\n"
+                f"Actual: tracking disabled"
+            )
+    except Exception as e:
+        print(f"Nickname sync failed for {member.display_name}: {str(e)}")
+
+def schedule_nickname_sync(member):
+    """(Re)start the debounce timer for one member"""
+    pending = bot.nick_sync_tasks.pop(member.id, None)
+    if pending:
+        pending.cancel()
+    bot.nick_sync_tasks[member.id] = bot.loop.create_task(sync_member_nickname(member))
+
+
+def edit_distance(a, b):
+    """Levenshtein distance between two strings"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        previous = current
+    return previous[-1]
+
+class CommandIndex:
+    """BK-tree over command names plus a sorted list for prefix lookups"""
+
+    def __init__(self, names):
+        self.names = sorted(set(names))
+        self._root = None
+        for name in self.names:
+            self._insert(name)
+
+    def _insert(self, name):
+        if self._root is None:
+            self._root = (name, {})
+            return
+        node = self._root
+        while True:
+            dist = edit_distance(name, node[0])
+            child = node[1].get(dist)
+            if child is None:
+                node[1][dist] = (name, {})
+                return
+            node = child
+
+    def fuzzy(self, word, max_dist):
+        """All names within max_dist edits of word as (distance, name)"""
+        matches = []
+        stack = [self._root] if self._root else []
+        while stack:
+            name, children = stack.pop()
+            dist = edit_distance(word, name)
+            if dist <= max_dist:
+                matches.append((dist, name))
+            for child_dist, child in children.items():
+                if dist - max_dist <= child_dist <= dist + max_dist:
+                    stack.append(child)
+        return matches
+
+    def prefixed(self, prefix):
+        start = bisect.bisect_left(self.names, prefix)
+        matches = []
+        for name in self.names[start:]:
+            if not name.startswith(prefix):
+                break
+            matches.append(name)
+        return matches
+
+def build_command_index():
+    """Precompute suggestion indexes per permission tier"""
+    names = [cmd.name for cmd in bot.commands]
+    regular = [cmd.name for cmd in bot.commands if not cmd.checks]
+    bot.command_index = {
+        True: CommandIndex(names),  # Admins may run everything
+        False: CommandIndex(regular),
+    }
+
+def suggest_commands(invoked, admin, limit=3):
+    """Closest command names for a typo, best match first"""
+    if bot.command_index is None:
+        build_command_index()
+    index = bot.command_index[admin]
+    ranked = {}
+    for dist, name in index.fuzzy(invoked, max(2, len(invoked) // 3)):
+        ranked[name] = dist
+    # Truncated commands like "vouch_hist" are good matches despite the distance
+    for name in index.prefixed(invoked):
+        ranked[name] = min(ranked.get(name, 1), 1)
+    ranked.pop(invoked, None)
+    return sorted(ranked, key=lambda name: (ranked[name], name))[:limit]
+
 # ========================
 # YOUR ORIGINAL COMMANDS (EXACTLY AS YOU HAD THEM)
 # ========================
 
-@bot.command()
+@bot.bridge_command()
 @commands.check(is_admin)
 async def unvouchable(ctx, member: discord.Member, action: str = "on"):
     """[ADMIN] Toggle unvouchable status (on/off)"""
-    action = action.lower()
-    if action in ("on", "enable", "yes", "true", "1"):
-        if not db_execute("INSERT OR IGNORE INTO unvouchable_users VALUES (?)", (member.id,)):
-            return await ctx.send("❌ Failed to update database!")
-        await ctx.send(f"🔒 {member.mention} is now unvouchable!")
-    else:
-        if not db_execute("DELETE FROM unvouchable_users WHERE user_id = ?", (member.id,)):
-            return await ctx.send("❌ Failed to update database!")
-        await ctx.send(f"🔓 {member.mention} can now be vouched!")
-    await update_nickname(member)
+    await ctx.defer()
+    async with bot.member_locks.hold(member.id):
+        action = action.lower()
+        enable = action in ("on", "enable", "yes", "true", "1")
+        try:
+            with db_transaction() as conn:
+                if enable:
+                    conn.execute("INSERT OR IGNORE INTO unvouchable_users VALUES (?)", (member.id,))
+                else:
+                    conn.execute("DELETE FROM unvouchable_users WHERE user_id = ?", (member.id,))
+                record_event("unvouchable", ctx.author.id, member.id, int(enable), conn=conn)
+        except sqlite3.Error:
+            return await ctx.respond("❌ Failed to update database!")
+        refresh_member_state(member.id)
+        if enable:
+            await ctx.respond(f"🔒 {member.mention} is now unvouchable!")
+        else:
+            await ctx.respond(f"🔓 {member.mention} can now be vouched!")
+        await update_nickname(member)
 
-@bot.command()
+@bot.bridge_command()
 async def checkunvouchable(ctx, member: discord.Member = None):
     """Check if a user is unvouchable"""
     target = member or ctx.author
     status = "🔒 UNVOUCHABLE" if is_unvouchable(target.id) else "🔓 Vouchable"
-    await ctx.send(f"{target.mention}: {status}")
+    await ctx.respond(f"{target.mention}: {status}")
 
-@bot.command()
+@bot.bridge_command()
 @commands.check(is_admin)
 async def unvouchable_list(ctx):
     """[ADMIN] List all unvouchable users"""
     unvouchables = db_fetchall("SELECT user_id FROM unvouchable_users")
     if not unvouchables:
-        return await ctx.send("No unvouchable users!")
+        return await ctx.respond("No unvouchable users!")
     
     members = [ctx.guild.get_member(row[0]) for row in unvouchables]
     members = [m for m in members if m]
     
     msg = "🔒 Unvouchable Users:\n" + "\n".join(f"{m.mention} ({m.display_name})" for m in members)
-    await ctx.send(msg[:2000])
+    await ctx.respond(msg[:2000])
+
+def release_vouch_spam(user_id):
+    if user_id in bot.vouch_spam:
+        bot.vouch_spam[user_id] -= 1
+        if bot.vouch_spam[user_id] <= 0:
+            del bot.vouch_spam[user_id]
 
-@bot.command()
+@bot.bridge_command()
 async def vouch(ctx, member: discord.Member, *, reason: str = "No reason provided"):
     """Vouch for a user (now with cooldown, reason, and DM notification)"""
     try:
@@ -265,181 +1474,188 @@ async def vouch(ctx, member: discord.Member, *, reason: str = "No reason provide
         if not admin:
             if ctx.author.id in bot.vouch_spam:
                 if bot.vouch_spam[ctx.author.id] >= 3:
-                    return await ctx.send("❌ You're vouching too fast!")
+                    return await ctx.respond("❌ You're vouching too fast!")
                 bot.vouch_spam[ctx.author.id] += 1
             else:
                 bot.vouch_spam[ctx.author.id] = 1
-            
+
+        await ctx.defer()
+        # Lock voucher and target so cooldown and count checks hold until written
+        async with bot.member_locks.hold(ctx.author.id, member.id):
             # Cooldown check
-            cooldown = db_fetchone("SELECT last_vouch_time FROM vouch_cooldowns WHERE user_id = ?", (ctx.author.id,))
-            if cooldown and cooldown[0]:
-                remaining = 24 - (time.time() - cooldown[0])//3600
-                if remaining > 0:
-                    return await ctx.send(f"❌ You can vouch again in {int(remaining)} hours!")
-        
-        # Original validations
-        if not admin:
-            if ctx.channel.name != "general":
-                print(ctx.channel.name)
-                return await ctx.send("❌ Use the vouch channel!")
-            if ctx.author == member:
-                return await ctx.send("❌ You can't vouch yourself!")
-            if has_vouched(ctx.author.id, member.id):
-                return await ctx.send("❌ You already vouched them!")
-            if is_unvouchable(member.id):
-                return await ctx.send("❌ This user is unvouchable!")
-            if not is_tracking_enabled(member.id):
-                return await ctx.send("❌ User hasn't enabled tracking!")
-
-        # Process vouch
-        new_count = get_vouches(member.id) + 1
-        if not db_execute("""
-        INSERT INTO vouches VALUES (?, ?, 1) 
-        ON CONFLICT(user_id) DO UPDATE SET vouch_count = ?
-        """, (member.id, new_count, new_count)):
-            return await ctx.send("❌ Database error!")
-        
-        if not admin:
-            if not db_execute("INSERT INTO vouch_records VALUES (?, ?)", (ctx.author.id, member.id)):
-                return await ctx.send("❌ Database error!")
-            db_execute("""
-            INSERT INTO vouch_reasons VALUES (?, ?, ?, ?)
-            ON CONFLICT(voucher_id, vouched_id) DO UPDATE SET reason = ?, timestamp = ?
-            """, (ctx.author.id, member.id, reason, int(time.time()), reason, int(time.time())))
-            
-            # Update cooldown
-            db_execute("""
-            INSERT INTO vouch_cooldowns VALUES (?, ?)
-            ON CONFLICT(user_id) DO UPDATE SET last_vouch_time = ?
-            """, (ctx.author.id, int(time.time()), int(time.time())))
-        
-        await update_nickname(member)
-        await ctx.send(f"✅ {member.mention} now has {new_count} vouches! Reason: {reason[:50]}")
+            if not admin:
+                last_vouch_time = get_last_vouch_time(ctx.author.id)
+                if last_vouch_time:
+                    remaining = 24 - (time.time() - last_vouch_time)//3600
+                    if remaining > 0:
+                        return await ctx.respond(f"❌ You can vouch again in {int(remaining)} hours!")
+
+            # Original validations
+            if not admin:
+                if ctx.channel.name != "general":
+                    print(ctx.channel.name)
+                    return await ctx.respond("❌ Use the vouch channel!")
+                if ctx.author == member:
+                    return await ctx.respond("❌ You can't vouch yourself!")
+                if has_vouched(ctx.author.id, member.id):
+                    return await ctx.respond("❌ You already vouched them!")
+                if is_unvouchable(member.id):
+                    return await ctx.respond("❌ This user is unvouchable!")
+                if not is_tracking_enabled(member.id):
+                    return await ctx.respond("❌ User hasn't enabled tracking!")
+
+            # Process vouch
+            new_count = get_vouches(member.id) + 1
+            now = int(time.time())
+            try:
+                # Count, event, record, rollups, reason and cooldown land together or not at all
+                with db_transaction() as conn:
+                    conn.execute("""
+                    INSERT INTO vouches VALUES (?, ?, 1) 
+                    ON CONFLICT(user_id) DO UPDATE SET vouch_count = ?
+                    """, (member.id, new_count, new_count))
+                    record_event("vouch", ctx.author.id, member.id, 1, conn=conn)
+                    if not admin:
+                        conn.execute("""
+                        INSERT INTO vouch_records (voucher_id, vouched_id, timestamp) VALUES (?, ?, ?)
+                        """, (ctx.author.id, member.id, now))
+                        rollup_vouch(ctx.author.id, now, conn=conn)
+                        conn.execute("""
+                        INSERT INTO vouch_reasons VALUES (?, ?, ?, ?)
+                        ON CONFLICT(voucher_id, vouched_id) DO UPDATE SET reason = ?, timestamp = ?
+                        """, (ctx.author.id, member.id, reason, now, reason, now))
+                        conn.execute("""
+                        INSERT INTO vouch_cooldowns VALUES (?, ?)
+                        ON CONFLICT(user_id) DO UPDATE SET last_vouch_time = ?
+                        """, (ctx.author.id, now, now))
+            except sqlite3.Error:
+                return await ctx.respond("❌ Database error!")
+            refresh_member_state(member.id)
+
+            if not admin:
+                bot.cooldowns[ctx.author.id] = now
+                check_vouch_patterns(ctx.guild, ctx.author, member)
+
+            await update_nickname(member)
+        await ctx.respond(f"✅ {member.mention} now has {new_count} vouches! Reason: {reason[:50]}")
 
         # ============================================
         # NEW: Send DM notification to the vouched user
         # ============================================
-        try:
-            embed = discord.Embed(
-                title="🎉 You've received a vouch!",
-                description=f"**{ctx.author.display_name}** vouched for you in {ctx.guild.name}",
-                color=discord.Color.green()
-            )
-            embed.add_field(name="Reason", value=reason[:1024], inline=False)
-            embed.add_field(name="Total Vouches", value=new_count)
-            embed.set_footer(text=f"Vouched at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}")
-            
-            await member.send(embed=embed)
-        except discord.Forbidden:
-            # User has DMs disabled or blocked the bot - silently fail
-            pass
-        except Exception as e:
-            print(f"Failed to send vouch DM: {e}")
+        # Delivered by the outbox workers, users with closed DMs are skipped
+        embed = discord.Embed(
+            title="🎉 You've received a vouch!",
+            description=f"**{ctx.author.display_name}** vouched for you in {ctx.guild.name}",
+            color=discord.Color.green()
+        )
+        embed.add_field(name="Reason", value=reason[:1024], inline=False)
+        embed.add_field(name="Total Vouches", value=new_count)
+        embed.set_footer(text=f"Vouched at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}")
+        enqueue_dm(member.id, embed=embed)
         # ============================================
         
         # Schedule spam counter reset
         if not admin:
-            await asyncio.sleep(60)
-            if ctx.author.id in bot.vouch_spam:
-                bot.vouch_spam[ctx.author.id] -= 1
-                if bot.vouch_spam[ctx.author.id] <= 0:
-                    del bot.vouch_spam[ctx.author.id]
+            bot.loop.call_later(60, release_vouch_spam, ctx.author.id)
         
     except Exception as e:
-        await ctx.send("❌ Failed to process vouch. Please try again.")
+        await ctx.respond("❌ Failed to process vouch. Please try again.")
         print(f"Vouch error: {e}")
 
-@bot.command()
+@bot.bridge_command()
 @commands.check(is_admin)
 async def clearvouches(ctx, member: discord.Member):
     """[ADMIN] Reset a user's vouches and allow re-vouching"""
-    with get_db() as conn:
-        # Reset vouch count
-        conn.execute("UPDATE vouches SET vouch_count = 0 WHERE user_id = ?", (member.id,))
-        # Clear vouch history
-        conn.execute("DELETE FROM vouch_records WHERE vouched_id = ?", (member.id,))
-        # Clear cooldowns (NEW)
-        conn.execute("DELETE FROM vouch_cooldowns WHERE user_id = ?", (member.id,))
-    
-    await update_nickname(member)
-    await ctx.send(f"♻️ Completely reset vouches for {member.mention}! Users can now vouch for them again.")
+    await ctx.defer()
+    async with bot.member_locks.hold(member.id):
+        with db_transaction(archive=True) as conn:
+            # Reset vouch count
+            conn.execute("UPDATE vouches SET vouch_count = 0 WHERE user_id = ?", (member.id,))
+            # Clear vouch history
+            conn.execute("DELETE FROM vouch_records WHERE vouched_id = ?", (member.id,))
+            voucharchive.purge(conn, member.id)
+            # Clear cooldowns (NEW)
+            conn.execute("DELETE FROM vouch_cooldowns WHERE user_id = ?", (member.id,))
+            record_event("clear", ctx.author.id, member.id, conn=conn)
+
+        refresh_member_state(member.id)
+        bot.cooldowns.pop(member.id, None)
+        invalidate_vouch_graph()
+        await update_nickname(member)
+    await ctx.respond(f"♻️ Completely reset vouches for {member.mention}! Users can now vouch for them again.")
 
 
-@bot.command()
+@bot.bridge_command()
 @commands.check(is_admin)
 async def clearvouches_all(ctx):
     """[ADMIN] Reset ALL vouches and cooldowns"""
-    with get_db() as conn:
+    await ctx.defer()
+    with db_transaction(archive=True) as conn:
         # Reset all counts
         conn.execute("UPDATE vouches SET vouch_count = 0")
         # Clear all records
         conn.execute("DELETE FROM vouch_records")
+        voucharchive.purge(conn)
         # Clear all cooldowns (NEW)
         conn.execute("DELETE FROM vouch_cooldowns")
+        record_event("clear_all", ctx.author.id, conn=conn)
     
+    bot.member_state = {user_id: (0, tracking, unvouchable)
+                        for user_id, (_, tracking, unvouchable) in bot.member_state.items()}
+    bot.cooldowns = {}
+    bot.cooldowns_complete = True
+    invalidate_vouch_graph()
+    await ctx.respond("♻️ Completely reset ALL vouches and cooldowns!")
     # Update nicknames
-    for member in ctx.guild.members:
-        if is_tracking_enabled(member.id):
-            await update_nickname(member)
-    
-    await ctx.send("♻️ Completely reset ALL vouches and cooldowns!")
+    await submit_job(ctx, "clearvouches_all")
 
-@bot.command()
+@bot.bridge_command()
 @commands.check(is_admin)
 async def fixnicks(ctx):
-    """[ADMIN] Force-clean ALL nicknames"""
-    count = 0
-    failed = 0
-    
-    await ctx.send("🔄 Starting nickname cleanup...")
-    
-    for member in ctx.guild.members:
-        try:
-            if is_tracking_enabled(member.id):
-                # First completely clean the nickname
-                base_name = clean_nickname(member.display_name)
-                await member.edit(nick=base_name)
-                
-                # Then properly update with tags
-                await update_nickname(member)
-                count += 1
-                await asyncio.sleep(0.5)  # Rate limiting
-        except Exception:
-            failed += 1
-    
-    await ctx.send(f"✅ Successfully updated {count} nicknames ({failed} failed)")
+    """[ADMIN] Force-clean ALL nicknames (runs in the background)"""
+    await submit_job(ctx, "fixnicks")
 
-@bot.command()
+@bot.bridge_command()
 @commands.check(is_admin)
 async def fix_vouch_records(ctx):
     """[ADMIN] Reconcile all vouch counts with records"""
+    await ctx.defer()
     fixed = 0
     users = db_fetchall("SELECT user_id, vouch_count FROM vouches")
     for user in users:
-        records = db_fetchone("SELECT COUNT(*) FROM vouch_records WHERE vouched_id = ?", (user['user_id'],))[0]
+        records = count_vouch_records(user['user_id'])
         diff = user['vouch_count'] - records
         
         if diff > 0:
-            # Add missing admin vouches
-            db_execute("INSERT INTO vouch_records (voucher_id, vouched_id) VALUES (?, ?)", 
-                      (ctx.author.id, user['user_id']))
-            fixed += diff
+            # Add the missing admin record, the same way the reconcile sweep does
+            try:
+                fixed += await reconcile_step({'actor_id': ctx.author.id}, ctx.guild, user['user_id'])
+            except sqlite3.Error as e:
+                print(f"Database error: {e}")
         elif diff < 0:
-            # Remove excess vouches
-            db_execute("""
-            DELETE FROM vouch_records 
-            WHERE rowid IN (
-                SELECT rowid FROM vouch_records 
-                WHERE vouched_id = ? 
-                ORDER BY rowid DESC 
-                LIMIT ?
-            )
-            """, (user['user_id'], abs(diff)))
-            fixed += abs(diff)
+            # Remove excess vouches, newest first, so the hot table before the archive
+            try:
+                with db_transaction(archive=True) as conn:
+                    removed = conn.execute("""
+                    DELETE FROM main.vouch_records 
+                    WHERE rowid IN (
+                        SELECT rowid FROM main.vouch_records 
+                        WHERE vouched_id = ? 
+                        ORDER BY rowid DESC 
+                        LIMIT ?
+                    )
+                    """, (user['user_id'], abs(diff))).rowcount
+                    if removed < abs(diff):
+                        removed += voucharchive.trim(conn, user['user_id'], abs(diff) - removed, newest=True)
+            except sqlite3.Error as e:
+                print(f"Database error: {e}")
+                continue
+            fixed += removed
     
-    await ctx.send(f"✅ Fixed {fixed} vouch record mismatches!")
+    invalidate_vouch_graph()
+    await ctx.respond(f"✅ Fixed {fixed} vouch record mismatches!")
 
-@bot.command()
+@bot.bridge_command()
 @commands.check(is_admin)
 async def nuclear_fix(ctx, member: discord.Member):
     """[ADMIN] COMPLETELY reset problematic nicknames"""
@@ -453,182 +1669,227 @@ async def nuclear_fix(ctx, member: discord.Member):
         # Step 2: Force update with clean tags
         await update_nickname(member)
         
-        await ctx.send(f"✅ Successfully reset {member.mention}'s nickname!")
+        await ctx.respond(f"✅ Successfully reset {member.mention}'s nickname!")
     except Exception as e:
-        await ctx.send(f"❌ Failed to reset nickname: {str(e)}")
+        await ctx.respond(f"❌ Failed to reset nickname: {str(e)}")
 
-@bot.command()
+@bot.bridge_command()
 @commands.check(is_admin)
 async def resetnick(ctx, member: discord.Member):
     """[ADMIN] Completely reset a user's nickname"""
     base_name = clean_nickname(member.display_name)
     try:
         await member.edit(nick=base_name)
-        await ctx.send(f"✅ Reset {member.mention}'s nickname!")
+        await ctx.respond(f"✅ Reset {member.mention}'s nickname!")
     except discord.HTTPException:
-        await ctx.send("❌ Failed to reset nickname (missing permissions)")
+        await ctx.respond("❌ Failed to reset nickname (missing permissions)")
 
-@bot.command()
+@bot.bridge_command()
 @commands.check(is_admin)
 async def setvouches(ctx, member: discord.Member, count: int):
     """[ADMIN] Set vouch count with timestamp tracking"""
-    current = get_vouches(member.id)
-    difference = count - current
-    current_time = int(time.time())
-    
-    try:
-        with get_db() as conn:
-            # Update main count
-            conn.execute("""
-                INSERT OR REPLACE INTO vouches 
-                VALUES (?, ?, 1)
-                """, (member.id, count))
-            
-            # Handle adjustments
-            if difference > 0:
-                # Insert with timestamps
-                conn.executemany("""
-                    INSERT OR IGNORE INTO vouch_records 
-                    (voucher_id, vouched_id, timestamp)
-                    VALUES (?, ?, ?)
-                    """, [(ctx.author.id, member.id, current_time)] * difference)
-            elif difference < 0:
-                # Delete oldest vouches first
+    await ctx.defer()
+    async with bot.member_locks.hold(member.id):
+        current = get_vouches(member.id)
+        difference = count - current
+        current_time = int(time.time())
+
+        try:
+            with db_transaction(archive=difference < 0) as conn:
+                # Update main count
                 conn.execute("""
-                    DELETE FROM vouch_records 
-                    WHERE rowid IN (
-                        SELECT rowid FROM vouch_records 
-                        WHERE vouched_id = ?
-                        ORDER BY timestamp ASC, rowid ASC
-                        LIMIT ?
-                    )
-                    """, (member.id, abs(difference)))
-        
-        await update_nickname(member)
-        await ctx.send(f"✅ Set {member.mention}'s vouches to {count}")
-    except sqlite3.Error as e:
-        await ctx.send(f"❌ Database error: {str(e)}")
-        print(f"Setvouches error: {traceback.format_exc()}")
+                    INSERT OR REPLACE INTO vouches 
+                    VALUES (?, ?, 1)
+                    """, (member.id, count))
+                record_event("set", ctx.author.id, member.id, count, conn=conn)
+
+                # Handle adjustments
+                if difference > 0:
+                    # Insert with timestamps
+                    conn.executemany("""
+                        INSERT OR IGNORE INTO vouch_records 
+                        (voucher_id, vouched_id, timestamp)
+                        VALUES (?, ?, ?)
+                        """, [(ctx.author.id, member.id, current_time)] * difference)
+                elif difference < 0:
+                    # Delete oldest vouches first, archived ones are the oldest
+                    remaining = abs(difference) - voucharchive.trim(conn, member.id, abs(difference))
+                    conn.execute("""
+                        DELETE FROM main.vouch_records 
+                        WHERE rowid IN (
+                            SELECT rowid FROM main.vouch_records 
+                            WHERE vouched_id = ?
+                            ORDER BY timestamp ASC, rowid ASC
+                            LIMIT ?
+                        )
+                        """, (member.id, remaining))
 
-@bot.command()
+            invalidate_vouch_graph()
+            refresh_member_state(member.id)
+            await update_nickname(member)
+            await ctx.respond(f"✅ Set {member.mention}'s vouches to {count}")
+        except sqlite3.Error as e:
+            await ctx.respond(f"❌ Database error: {str(e)}")
+            print(f"Setvouches error: {traceback.format_exc()}")
+
+@bot.bridge_command()
 async def enablevouch(ctx):
     """Enable vouch tracking"""
     if not is_admin(ctx) and ctx.channel.name != "✅︱𝑽𝒐𝒖𝒄𝒉𝒆𝒔":
-        return await ctx.send("❌ Use the vouch channel!")
-    
-    if not db_execute("""
-    INSERT INTO vouches (user_id, tracking_enabled) VALUES (?, 1) 
-    ON CONFLICT(user_id) DO UPDATE SET tracking_enabled = 1
-    """, (ctx.author.id,)):
-        return await ctx.send("❌ Database error!")
+        return await ctx.respond("❌ Use the vouch channel!")
     
-    await update_nickname(ctx.author)
-    await ctx.send(f"✅ Vouch tracking enabled for {ctx.author.mention}!")
-
-@bot.command()
+    await ctx.defer()
+    async with bot.member_locks.hold(ctx.author.id):
+        newly_tracked = not is_tracking_enabled(ctx.author.id)
+        if not db_execute("""
+        INSERT INTO vouches (user_id, tracking_enabled) VALUES (?, 1) 
+        ON CONFLICT(user_id) DO UPDATE SET tracking_enabled = 1
+        """, (ctx.author.id,)):
+            return await ctx.respond("❌ Database error!")
+        refresh_member_state(ctx.author.id)
+        if newly_tracked:
+            rollup_new_tracked(time.time())
+
+        await update_nickname(ctx.author)
+    await ctx.respond(f"✅ Vouch tracking enabled for {ctx.author.mention}!")
+
+@bot.bridge_command()
 async def disablevouch(ctx):
     """Disable vouch tracking"""
     if not is_admin(ctx) and ctx.channel.name != "✅︱𝑽𝒐𝒖𝒄𝒉𝒆𝒔":
-        return await ctx.send("❌ Use the vouch channel!")
+        return await ctx.respond("❌ Use the vouch channel!")
     
-    if not db_execute("UPDATE vouches SET tracking_enabled = 0 WHERE user_id = ?", (ctx.author.id,)):
-        return await ctx.send("❌ Database error!")
-    await update_nickname(ctx.author)
-    await ctx.send(f"✅ Vouch tracking disabled for {ctx.author.mention}!")
-
-@bot.command()
+    await ctx.defer()
+    async with bot.member_locks.hold(ctx.author.id):
+        if not db_execute("UPDATE vouches SET tracking_enabled = 0 WHERE user_id = ?", (ctx.author.id,)):
+            return await ctx.respond("❌ Database error!")
+        refresh_member_state(ctx.author.id)
+        await update_nickname(ctx.author)
+    await ctx.respond(f"✅ Vouch tracking disabled for {ctx.author.mention}!")
+
+@bot.bridge_command()
 @commands.check(is_admin)
 async def enablevouches_all(ctx):
-    """[ADMIN] Enable tracking for all"""
-    count = 0
-    for member in ctx.guild.members:
-        if not is_admin(ctx) and not is_tracking_enabled(member.id):
-            if db_execute("""
-            INSERT INTO vouches (user_id, tracking_enabled) VALUES (?, 1)
-            ON CONFLICT(user_id) DO UPDATE SET tracking_enabled = 1
-            """, (member.id,)):
-                count += 1
-                await update_nickname(member)
-    
-    await ctx.send(f"✅ Enabled tracking for {count} users!")
+    """[ADMIN] Enable tracking for all (runs in the background)"""
+    await submit_job(ctx, "enablevouches_all")
 
-@bot.command()
+@bot.bridge_command()
 @commands.check(is_admin)
 async def disablevouches_all(ctx):
-    """[ADMIN] Disable tracking for all"""
-    count = 0
-    for member in ctx.guild.members:
-        if is_tracking_enabled(member.id):
-            if db_execute("UPDATE vouches SET tracking_enabled = 0 WHERE user_id = ?", (member.id,)):
-                count += 1
-                await update_nickname(member)
-    
-    await ctx.send(f"✅ Disabled tracking for {count} users!")
+    """[ADMIN] Disable tracking for all (runs in the background)"""
+    await submit_job(ctx, "disablevouches_all")
 
-@bot.command()
+@bot.bridge_command()
 @commands.check(is_admin)
 async def reconcile_vouches(ctx, member: discord.Member = None):
     """[ADMIN] Fix vouch record mismatches safely"""
+    await ctx.defer()
     try:
         if member:
-            # Single user reconciliation
-            vouch_count = get_vouches(member.id)
-            records = db_fetchone("SELECT COUNT(*) FROM vouch_records WHERE vouched_id = ?", (member.id,))[0]
-            
-            if vouch_count > records:
-                needed = vouch_count - records
-                db_execute("""
-                    INSERT OR IGNORE INTO vouch_records 
-                    SELECT DISTINCT ?, ? 
-                    WHERE NOT EXISTS (
-                        SELECT 1 FROM vouch_records 
-                        WHERE voucher_id = ? AND vouched_id = ?
-                    )
-                    LIMIT ?
-                    """, (ctx.author.id, member.id, ctx.author.id, member.id, needed))
-                await ctx.send(f"✅ Added {needed} admin records for {member.mention}")
+            # Single user reconciliation, under the member's lock like the sweep
+            added = await reconcile_step({'actor_id': ctx.author.id}, ctx.guild, member.id)
+            if added:
+                invalidate_vouch_graph()
+            short = get_vouches(member.id) - count_vouch_records(member.id)
+            if short > 0:
+                # Only one record per (admin, user) pair can exist
+                await ctx.respond(f"⚠️ Added {added} admin record for {member.mention}, "
+                                  f"still {short} short of their vouch count")
+            elif added:
+                await ctx.respond(f"✅ Added {added} admin record for {member.mention}")
             else:
-                await ctx.send(f"ℹ️ {member.mention}'s records are correct")
+                await ctx.respond(f"ℹ️ {member.mention}'s records are correct")
         else:
             # Full server reconciliation
-            fixed = 0
-            users = db_fetchall("SELECT user_id, vouch_count FROM vouches WHERE vouch_count > 0")
-            
-            for user in users:
-                records = db_fetchone("SELECT COUNT(*) FROM vouch_records WHERE vouched_id = ?", (user['user_id'],))[0]
-                if records < user['vouch_count']:
-                    needed = user['vouch_count'] - records
-                    db_execute("""
-                        INSERT OR IGNORE INTO vouch_records 
-                        SELECT DISTINCT ?, ? 
-                        WHERE NOT EXISTS (
-                            SELECT 1 FROM vouch_records 
-                            WHERE voucher_id = ? AND vouched_id = ?
-                        )
-                        LIMIT ?
-                        """, (ctx.author.id, user['user_id'], ctx.author.id, user['user_id'], needed))
-                    fixed += needed
-            
-            await ctx.send(f"✅ Fixed {fixed} vouch record mismatches")
+            await submit_job(ctx, "reconcile_vouches")
     except sqlite3.Error as e:
-        await ctx.send(f"❌ Database error during reconciliation: {str(e)}")
+        await ctx.respond(f"❌ Database error during reconciliation: {str(e)}")
 
-@bot.command()
+@bot.bridge_command()
 @commands.check(is_admin)
-async def vouch_history(ctx, member: discord.Member, limit: int = 5):
-    """[ADMIN] Show recent vouch activity for a user"""
-    records = db_fetchall("""
-        SELECT vr.voucher_id, vr.timestamp, uu.user_id IS NOT NULL as is_admin, vr2.reason
-        FROM vouch_records vr
-        LEFT JOIN unvouchable_users uu ON vr.voucher_id = uu.user_id
-        LEFT JOIN vouch_reasons vr2 ON vr.voucher_id = vr2.voucher_id AND vr.vouched_id = vr2.vouched_id
-        WHERE vr.vouched_id = ?
-        ORDER BY vr.timestamp DESC
-        LIMIT ?
-    """, (member.id, limit))
+async def job_status(ctx, job_id: int = None):
+    """[ADMIN] Show a background job's progress (latest job by default)"""
+    if job_id is None:
+        row = db_fetchone("SELECT id FROM jobs WHERE guild_id = ? ORDER BY id DESC LIMIT 1", (ctx.guild.id,))
+        job_id = row['id'] if row else None
+    job = bot.jobs.get(job_id) or (load_job(job_id) if job_id else None)
+    if job is None or job['guild_id'] != ctx.guild.id:
+        return await ctx.respond("❌ No such job!")
+    message = await respond_message(ctx, render_job(job))
+    if job_id in bot.jobs:
+        # Progress edits move to this message
+        job['channel_id'] = ctx.channel.id
+        job['message_id'] = getattr(message, "id", None)
+        save_job(job)
+
+@bot.bridge_command()
+@commands.check(is_admin)
+async def job_cancel(ctx, job_id: int):
+    """[ADMIN] Cancel a queued or running background job"""
+    job = bot.jobs.get(job_id)
+    if job is None or job['guild_id'] != ctx.guild.id:
+        return await ctx.respond(f"❌ Job #{job_id} isn't running!")
+    bot.job_cancels.add(job_id)
+    job['task'].cancel()
+    await ctx.respond(f"🛑 Cancelling job #{job_id}...")
+
+@bot.bridge_command()
+@commands.check(is_admin)
+async def replay_vouches(ctx):
+    """[ADMIN] Rebuild vouch counts and unvouchable list from the event log"""
+    await ctx.defer()
+    try:
+        changed, last_seq = await asyncio.to_thread(apply_vouch_replay)
+    except sqlite3.Error as e:
+        return await ctx.respond(f"❌ Database error during replay: {str(e)}")
+
+    for user_id in changed:
+        refresh_member_state(user_id)
+    for user_id in changed:
+        if member := ctx.guild.get_member(user_id):
+            await update_nickname(member)
 
-    if not records:
-        return await ctx.send(f"No vouch history found for {member.mention}")
+    await ctx.respond(f"✅ Replayed events up to #{last_seq}, corrected {len(changed)} users")
+
+@bot.bridge_command()
+@commands.check(is_admin)
+async def vouch_history(ctx, member: discord.Member, limit: int = 5, archived: bool = False):
+    """[ADMIN] Show recent vouch activity for a user (archived:True to include archived vouches)"""
+    if archived:
+        await ctx.defer()
+        try:
+            with get_archive_db() as conn:
+                records = conn.execute("""
+                    SELECT vr.voucher_id, vr.timestamp, uu.user_id IS NOT NULL as is_admin,
+                           COALESCE(hot.reason, zdecompress(cold.reason)) as reason
+                    FROM (SELECT voucher_id, vouched_id, timestamp FROM main.vouch_records WHERE vouched_id = ?
+                          UNION ALL
+                          SELECT voucher_id, vouched_id, timestamp FROM archive.vouch_records WHERE vouched_id = ?) vr
+                    LEFT JOIN unvouchable_users uu ON vr.voucher_id = uu.user_id
+                    LEFT JOIN main.vouch_reasons hot ON vr.voucher_id = hot.voucher_id AND vr.vouched_id = hot.vouched_id
+                    LEFT JOIN archive.vouch_reasons cold ON vr.voucher_id = cold.voucher_id AND vr.vouched_id = cold.vouched_id
+                    ORDER BY vr.timestamp DESC
+                    LIMIT ?
+                """, (member.id, member.id, limit)).fetchall()
+        except sqlite3.Error as e:
+            return await ctx.respond(f"❌ Database error reading the archive: {str(e)}")
+    else:
+        records = db_fetchall("""
+            SELECT vr.voucher_id, vr.timestamp, uu.user_id IS NOT NULL as is_admin, vr2.reason
+            FROM vouch_records vr
+            LEFT JOIN unvouchable_users uu ON vr.voucher_id = uu.user_id
+            LEFT JOIN vouch_reasons vr2 ON vr.voucher_id = vr2.voucher_id AND vr.vouched_id = vr2.vouched_id
+            WHERE vr.vouched_id = ?
+            ORDER BY vr.timestamp DESC
+            LIMIT ?
+        """, (member.id, limit))
+    archived_count = 0
+    if not archived and len(records) < limit:
+        row = db_fetchone("SELECT archived FROM vouch_archive_counts WHERE vouched_id = ?", (member.id,))
+        archived_count = row[0] if row else 0
+
+    if not records and not archived_count:
+        return await ctx.respond(f"No vouch history found for {member.mention}")
 
     lines = []
     for record in records:
@@ -641,12 +1902,14 @@ async def vouch_history(ctx, member: discord.Member, limit: int = 5):
             f"- Reason: {record['reason'] or 'None'}"
         )
 
-    await ctx.send(
+    await ctx.respond(
         f"**Last {limit} vouches for {member.mention}:**\n"
         + "\n".join(lines)
+        + (f"\n📦 {archived_count} older vouches archived, add archived:True to include them"
+           if archived_count else "")
     )
 
-@bot.command()
+@bot.bridge_command()
 @commands.check(is_admin)
 async def fix_vouch_timestamps(ctx):
     """[ADMIN] Repair missing timestamps in old records"""
@@ -656,21 +1919,106 @@ async def fix_vouch_timestamps(ctx):
         WHERE timestamp = 0 OR timestamp IS NULL
     """, (int(time.time()),))
     
-    await ctx.send(f"✅ Updated timestamps for {count} records")
+    await ctx.respond(f"✅ Updated timestamps for {count} records")
+
+@bot.bridge_command()
+@commands.check(is_admin)
+async def archive_vouches(ctx, days: int = None):
+    """[ADMIN] Move vouch records/reasons older than `days` (default RETENTION_DAYS) to the archive"""
+    days = RETENTION_DAYS if days is None else days
+    if not ARCHIVE_ENABLED:
+        return await ctx.respond("❌ The archive is disabled, set RETENTION_DAYS to enable it")
+    if days <= 0:
+        return await ctx.respond("❌ Give an age in days, automatic archival is disabled")
+    await ctx.defer()
+    try:
+        records, reasons = await asyncio.to_thread(archive_old_vouches, days)
+        with get_archive_db() as conn:
+            sizes = voucharchive.tier_sizes(conn)
+    except sqlite3.Error as e:
+        return await ctx.respond(f"❌ Database error during archival: {str(e)}")
+    await ctx.respond(
+        f"📦 Archived {records} records and {reasons} reasons older than {days} days\n"
+        f"🔥 Hot: {sizes['main.vouch_records']} records, {sizes['main.vouch_reasons']} reasons\n"
+        f"🧊 Archive: {sizes['archive.vouch_records']} records, {sizes['archive.vouch_reasons']} reasons"
+    )
+
 
+@bot.bridge_command()
+@commands.check(is_admin)
+async def vouch_rings(ctx, limit: int = 5):
+    """[ADMIN] Report mutual vouches, vouch rings and suspicious vouch inflows"""
+    await ctx.defer()
+    graph = bot.vouch_graph or await refresh_vouch_graph()
+
+    def analyse():
+        return (list(graph.reciprocal_pairs()), graph.dense_clusters(), graph.suspicious_inflows())
+    pairs, clusters, inflows = await asyncio.to_thread(analyse)
+
+    def name(user_id):
+        member = ctx.guild.get_member(user_id)
+        return member.display_name if member else f"Unknown User ({user_id})"
+
+    lines = [f"**Vouch graph:** {len(graph.user_ids)} users, {graph.edge_count} vouches"]
+    lines.append(f"🔁 **Mutual pairs ({len(pairs)}):**")
+    lines.extend(f"• {name(a)} ⇄ {name(b)}" for a, b in pairs[:limit])
+    lines.append(f"🕸️ **Dense clusters ({len(clusters)}):**")
+    lines.extend(
+        f"• {len(c['members'])} users, density {c['density']}: "
+        + ", ".join(name(u) for u in c['members'][:8])
+        for c in clusters[:limit]
+    )
+    lines.append(f"🧦 **Suspicious inflows ({len(inflows)}):**")
+    lines.extend(
+        f"• {name(r['user_id'])}: {r['throwaway']}/{r['vouchers']} throwaway vouchers"
+        for r in inflows[:limit]
+    )
+    await ctx.respond("\n".join(lines)[:2000])
+
+    for cluster in clusters[:limit]:
+        for user_id in cluster['members']:
+            if member := ctx.guild.get_member(user_id):
+                dispatch_admin_alert(ctx.guild, member,
+                    f"🕸️ Vouch Ring\n"
+                    f"Part of a {len(cluster['members'])}-user mutual vouch cluster "
+                    f"(density {cluster['density']})"
+                )
+                break
 
-@bot.command()
+@bot.bridge_command()
+@commands.check(is_admin)
+async def lockstats(ctx, reset: str = None):
+    """[ADMIN] Show per-member lock contention (pass "reset" to clear the counters)"""
+    stats = bot.member_locks.stats()
+    lines = [
+        f"🔐 **Member locks:** {stats['acquired']} acquired, {stats['contended']} waited, "
+        f"{stats['held']} held now",
+        f"⏱️ Wait avg {stats['wait_avg'] * 1000:.1f}ms, max {stats['wait_max'] * 1000:.1f}ms",
+    ]
+    if stats['hot_members']:
+        lines.append("🔥 **Hot members:**")
+        for user_id, waits in stats['hot_members']:
+            member = ctx.guild.get_member(user_id)
+            name = member.mention if member else f"Unknown User ({user_id})"
+            lines.append(f"• {name}: {waits} waits")
+    if reset == "reset":
+        bot.member_locks.reset_stats()
+        lines.append("♻️ Counters reset")
+    await ctx.respond("\n".join(lines)[:2000])
+
+@bot.bridge_command()
 async def vouch_sources(ctx, member: discord.Member):
     """Check where a user's vouches came from"""
-    vouchers = db_fetchall("""
-    SELECT voucher_id, COUNT(*) as count 
-    FROM vouch_records 
-    WHERE vouched_id = ?
-    GROUP BY voucher_id
-    """, (member.id,))
+    with get_archive_db() as conn:
+        vouchers = conn.execute("""
+        SELECT voucher_id, COUNT(*) as count 
+        FROM (SELECT voucher_id FROM main.vouch_records WHERE vouched_id = ?
+              UNION ALL SELECT voucher_id FROM archive.vouch_records WHERE vouched_id = ?)
+        GROUP BY voucher_id
+        """, (member.id, member.id)).fetchall()
     
     if not vouchers:
-        return await ctx.send(f"❌ No vouch records found for {member.mention}")
+        return await ctx.respond(f"❌ No vouch records found for {member.mention}")
     
     lines = []
     for v in vouchers:
@@ -678,20 +2026,40 @@ async def vouch_sources(ctx, member: discord.Member):
         name = user.mention if user else f"Unknown User ({v['voucher_id']})"
         lines.append(f"{name}: {v['count']} vouches")
     
-    await ctx.send(
+    await ctx.respond(
         f"**Vouch Sources for {member.mention}**\n" +
         "\n".join(lines)[:2000]
     )
 
-@bot.command()
+@bot.bridge_command()
 async def vouchstats(ctx, display: str = "count"):
-    """View vouch statistics"""
+    """View vouch statistics (count, list, or for admins a range like 30d / 12w)"""
+    if match := re.fullmatch(r'(\d+)([dw])', display.lower()):
+        if not is_admin(ctx):
+            return await ctx.respond("❌ Only admins can view vouch activity!")
+        amount, unit = int(match.group(1)), match.group(2)
+        days = min(amount * (7 if unit == "w" else 1), 3650)
+        activity = await asyncio.to_thread(vouch_activity, days, "week" if unit == "w" else "day")
+
+        lines = [f"📈 Vouch activity, last {display.lower()}:"]
+        for point in activity['series'][-20:]:
+            lines.append(f"{point['start']}: {point['vouches']} vouches, {point['new_tracked']} new tracked")
+        if not activity['series']:
+            lines.append("No activity in this range")
+        if activity['top_vouchers']:
+            lines.append("**Top vouchers:**")
+            for row in activity['top_vouchers']:
+                member = ctx.guild.get_member(row['user_id'])
+                name = member.display_name if member else f"Unknown User ({row['user_id']})"
+                lines.append(f"• {name}: {row['vouches']}")
+        return await ctx.respond("\n".join(lines)[:2000])
+
     enabled_users = db_fetchall("SELECT user_id FROM vouches WHERE tracking_enabled = 1")
     count = len(enabled_users)
     
     if display.lower() == "list":
         if not is_admin(ctx):
-            return await ctx.send("❌ Only admins can view the full list!")
+            return await ctx.respond("❌ Only admins can view the full list!")
         
         users = []
         for row in enabled_users:
@@ -699,15 +2067,15 @@ async def vouchstats(ctx, display: str = "count"):
                 users.append(f"{member.mention} ({member.display_name})")
         
         msg = f"📊 Users with tracking ({count}):\n" + "\n".join(users)
-        await ctx.send(msg[:2000])
+        await ctx.respond(msg[:2000])
     else:
-        await ctx.send(f"📊 {count} users have vouch tracking enabled")
+        await ctx.respond(f"📊 {count} users have vouch tracking enabled")
 
 # ========================
 # NEW ENHANCEMENTS (ADDED WITHOUT MODIFYING EXISTING CODE)
 # ========================
 
-@bot.command()
+@bot.bridge_command()
 async def verify(ctx, member: discord.Member = None):
     """Verify vouch count with admin vouch context"""
     target = member or ctx.author
@@ -717,7 +2085,7 @@ async def verify(ctx, member: discord.Member = None):
         data = conn.execute("""
             SELECT 
                 v.vouch_count,
-                COUNT(vr.voucher_id) as total_vouches,
+                COUNT(vr.voucher_id) as hot_vouches,
                 SUM(CASE WHEN uu.user_id IS NOT NULL THEN 1 ELSE 0 END) as admin_vouches,
                 MAX(vr.timestamp) as last_vouch_time,
                 v.tracking_enabled,
@@ -731,7 +2099,7 @@ async def verify(ctx, member: discord.Member = None):
 
     # 2. Parse data
     vouch_count = data[0] if data else 0
-    total_vouches = data[1] if data else 0
+    total_vouches = count_vouch_records(target.id) if data else 0
     admin_vouches = data[2] if data else 0
     last_vouch_time = data[3] if data else 0
     tracking_enabled = data[4] if data else False
@@ -743,7 +2111,7 @@ async def verify(ctx, member: discord.Member = None):
     # 3. Check nickname tags
     displayed_vouches = 0
     if target.display_name:
-        match = re.search(r'[\[［](\d+)V[\]］]', target.display_name)
+        match = VOUCH_TAG_PATTERN.search(target.display_name)
         if match:
             displayed_vouches = int(match.group(1))
 
@@ -764,7 +2132,7 @@ async def verify(ctx, member: discord.Member = None):
         status = "⚙️ TRACKING OFF"
     elif displayed_vouches > vouch_count:
         status = "🚨 FAKE TAGS"
-        await notify_admins(ctx.guild, target, 
+        dispatch_admin_alert(ctx.guild, target, 
             f"⚠️ Fake Tags Detected\n"
             f"Shows: {displayed_vouches}V\n"
             f"Actual: {vouch_count} vouches"
@@ -782,15 +2150,50 @@ async def verify(ctx, member: discord.Member = None):
         status = "✅ VERIFIED"
 
     response.append(f"• Status: {status}")
-    await ctx.send("\n".join(response))
+    await ctx.respond("\n".join(response))
+
+def get_alert_recipients(guild):
+    """Cached set of non-bot members holding an alert role"""
+    recipients = bot.alert_recipients.get(guild.id)
+    if recipients is None:
+        recipients = [m for m in guild.members
+                      if not m.bot and any(r.name in ALERT_ROLE_NAMES for r in m.roles)]
+        bot.alert_recipients[guild.id] = recipients
+    return recipients
+
+def dispatch_admin_alert(guild, member, reason):
+    """Fire-and-forget notify_admins, coalescing repeats of the same issue"""
+    key = (guild.id, member.id, reason.split("\n", 1)[0])
+    now = time.time()
+    if now - bot.recent_alerts.get(key, 0) < ALERT_DEDUP_WINDOW:
+        return False
+    bot.recent_alerts[key] = now
+    bot.loop.create_task(notify_admins(guild, member, reason))
+    return True
+
+def prune_recent_alerts():
+    cutoff = time.time() - ALERT_DEDUP_WINDOW
+    for key in [k for k, sent in bot.recent_alerts.items() if sent < cutoff]:
+        del bot.recent_alerts[key]
+
+async def send_alert_dm(admin, member, embed):
+    """DM one admin and register the message for ✅/❌ handling"""
+    async with bot.alert_semaphore:
+        try:
+            msg = await admin.send(embed=embed)
+            # Track before reacting so an early admin reaction still counts
+            bot.discrepancy_notifications.add(msg.id, admin.id, member.id)
+            await asyncio.gather(msg.add_reaction("✅"), msg.add_reaction("❌"))
+            return True
+        except discord.Forbidden:
+            return False
+        except discord.HTTPException as e:
+            print(f"Admin DM failed for {admin.display_name}: {e}")
+            return False
 
 async def notify_admins(guild, member, reason):
     """Send alerts to admins via DM or staff channel"""
-    admin_roles = ["Administrator™🌟", "𝓞𝔀𝓷𝓮𝓻 👑", "𓂀 𝒞𝑜-𝒪𝓌𝓃𝑒𝓻 𓂀✅"]
-    recipients = list({m for role in guild.roles 
-                      if role.name in admin_roles 
-                      for m in role.members 
-                      if not m.bot})
+    recipients = get_alert_recipients(guild)
 
     # Get the staff channel
     staff_channel = discord.utils.get(guild.text_channels, name=STAFF_CHANNEL_NAME)
@@ -803,25 +2206,9 @@ async def notify_admins(guild, member, reason):
     embed.add_field(name="Issue", value=reason, inline=False)
     embed.add_field(name="Action Required", value="Please verify and respond with ✅ to reset or ❌ to ignore", inline=False)
     
-    # Try DMing each admin
-    notified = False
-    for admin in recipients:
-        try:
-            msg = await admin.send(embed=embed)
-            await msg.add_reaction("✅")
-            await msg.add_reaction("❌")
-            
-            # Track this notification
-            if not hasattr(bot, 'discrepancy_notifications'):
-                bot.discrepancy_notifications = {}
-            bot.discrepancy_notifications[msg.id] = {
-                'admin_id': admin.id,
-                'member_id': member.id,
-                'timestamp': time.time()
-            }
-            notified = True
-        except discord.Forbidden:
-            continue
+    # DM all admins concurrently (bounded by ALERT_CONCURRENCY)
+    results = await asyncio.gather(*(send_alert_dm(admin, member, embed) for admin in recipients))
+    notified = any(results)
     
     # Fallback to staff channel if DMs failed
     if not notified and staff_channel:
@@ -830,71 +2217,80 @@ async def notify_admins(guild, member, reason):
                 content=" ".join(m.mention for m in recipients),
                 embed=embed
             )
+            # Track channel notification differently
+            bot.discrepancy_notifications.add(msg.id, guild.me.id, member.id)  # Mark as channel message
             await msg.add_reaction("✅")
             await msg.add_reaction("❌")
-            
-            # Track channel notification differently
-            bot.discrepancy_notifications[msg.id] = {
-                'admin_id': guild.me.id,  # Mark as channel message
-                'member_id': member.id,
-                'timestamp': time.time()
-            }
         except discord.Forbidden:
             print(f"Failed to send to {STAFF_CHANNEL_NAME}")
         except discord.HTTPException as e:
             print(f"Channel notification failed: {e}")
 
-@bot.command()
+@bot.bridge_command()
 async def myvouches(ctx):
     """Check your own vouch count and status"""
     count = get_vouches(ctx.author.id)
-    cooldown = db_fetchone("SELECT last_vouch_time FROM vouch_cooldowns WHERE user_id = ?", (ctx.author.id,))
+    last_vouch_time = get_last_vouch_time(ctx.author.id)
     
     msg = f"You have {count} legitimate vouches"
-    if cooldown and cooldown[0]:
-        remaining = max(0, 24 - (time.time() - cooldown[0])//3600)
+    if last_vouch_time:
+        remaining = max(0, 24 - (time.time() - last_vouch_time)//3600)
         if remaining > 0:
             msg += f"\n⏳ You can vouch again in {int(remaining)} hours"
     
-    await ctx.send(msg)
+    await ctx.respond(msg)
 
-@bot.command()
+@bot.bridge_command()
 async def vouchboard(ctx, limit: int = 10):
     """Show top vouched members"""
-    top = db_fetchall("""
-    SELECT user_id, vouch_count 
-    FROM vouches 
-    WHERE tracking_enabled = 1
-    ORDER BY vouch_count DESC 
-    LIMIT ?
-    """, (limit,))
+    if bot.member_state_complete:
+        top = [{'user_id': user_id, 'vouch_count': count} for count, user_id in heapq.nlargest(
+            limit, ((count, user_id) for user_id, (count, tracking, _) in bot.member_state.items() if tracking))]
+    else:
+        top = db_fetchall("""
+        SELECT user_id, vouch_count 
+        FROM vouches 
+        WHERE tracking_enabled = 1
+        ORDER BY vouch_count DESC 
+        LIMIT ?
+        """, (limit,))
     
     msg = "🏆 Top Vouched Members:\n"
     for i, row in enumerate(top, 1):
         if member := ctx.guild.get_member(row['user_id']):
             msg += f"{i}. {member.display_name}: {row['vouch_count']}V\n"
     
-    await ctx.send(msg[:2000])
+    await ctx.respond(msg[:2000])
 
-@bot.command()
+@bot.bridge_command()
 @commands.check(is_admin)
 async def backup_db(ctx):
     """[ADMIN] Create a database backup"""
+    await ctx.defer()
     try:
-        with open('vouches.db', 'rb') as f:
+        backup_path = await asyncio.to_thread(storage_engine.snapshot)
+        with tempfile.TemporaryDirectory() as tmp:
+            files = [discord.File(backup_path, 'vouches_backup.db')]
+            if ARCHIVE_ENABLED:
+                # The archive is a separate file, back it up alongside the hot database
+                archive_copy = os.path.join(tmp, 'vouches_archive_backup.db')
+                await asyncio.to_thread(voucharchive.backup, ARCHIVE_PATH, archive_copy)
+                files.append(discord.File(archive_copy, 'vouches_archive_backup.db'))
             # Send to both the original channel and admin alerts channel
-            await ctx.send("Database backup created successfully!")
+            await ctx.respond("Database backup created successfully!")
             alert_channel = bot.get_channel(ADMIN_ALERTS_CHANNEL_ID)
             if alert_channel:
                 await alert_channel.send(
                     f"Database backup requested by {ctx.author.mention} (ID: {ctx.author.id}):",
-                    file=discord.File(f, 'vouches_backup.db')
+                    files=files
                 )
             else:
-                await ctx.send("⚠️ Could not find admin alerts channel, but backup was created.")
+                await ctx.respond("⚠️ Could not find admin alerts channel, but backup was created.")
+            for file in files:
+                file.close()
     except Exception as e:
         error_msg = f"❌ Backup failed: {str(e)}"
-        await ctx.send(error_msg)
+        await ctx.respond(error_msg)
         # Try to send error to admin channel too
         try:
             alert_channel = bot.get_channel(ADMIN_ALERTS_CHANNEL_ID)
@@ -903,46 +2299,129 @@ async def backup_db(ctx):
         except:
             pass
 
+@bot.bridge_command()
+@commands.check(is_admin)
+async def export_data(ctx, table: str = "all"):
+    """[ADMIN] Export all tables as JSONL, or one table as CSV"""
+    await ctx.defer()
+    if table != "all" and table not in vouchdata.EXPORT_TABLES:
+        return await ctx.respond(f"❌ Unknown table! Choose from: all, {', '.join(vouchdata.EXPORT_TABLES)}")
+
+    filename = "vouches_export.jsonl.gz" if table == "all" else f"{table}.csv.gz"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, filename)
+        try:
+            count = await asyncio.to_thread(
+                vouchdata.export_file, archive_reader, path, None if table == "all" else table)
+        except (ValueError, sqlite3.Error, OSError) as e:
+            return await ctx.respond(f"❌ Export failed: {str(e)}")
+
+        alert_channel = bot.get_channel(ADMIN_ALERTS_CHANNEL_ID)
+        if not alert_channel:
+            return await ctx.respond("⚠️ Could not find admin alerts channel to upload the export.")
+        await alert_channel.send(
+            f"Data export ({count} rows) requested by {ctx.author.mention} (ID: {ctx.author.id}):",
+            file=discord.File(path, filename)
+        )
+    await ctx.respond(f"✅ Exported {count} rows to the admin alerts channel")
+
+@bot.bridge_command()
+@commands.check(is_admin)
+async def import_data(ctx, file: discord.Attachment, table: str = None):
+    """[ADMIN] Import an export file (.jsonl[.gz], or .csv[.gz] with a table)"""
+    await ctx.defer()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, os.path.basename(file.filename))
+        try:
+            await file.save(path)
+            # Batched so commands can still write while a big file is imported
+            counts = await asyncio.to_thread(
+                vouchdata.import_file, get_archive_db if ARCHIVE_ENABLED else get_db, path, table,
+                batched=True)
+        except (ValueError, OSError, discord.HTTPException) as e:
+            # Tables and columns are checked before anything is written
+            return await ctx.respond(f"❌ Import failed: {str(e)}")
+        except sqlite3.Error as e:
+            # Batches committed before the error stay, resync caches with them
+            invalidate_vouch_graph()
+            reload_member_state()
+            return await ctx.respond(f"❌ Import failed partway, earlier batches were kept: {str(e)}")
+
+    summary = ", ".join(f"{name}: {n}" for name, n in counts.items()) or "no rows"
+    await asyncio.to_thread(backfill_rollups)
+    invalidate_vouch_graph()
+    reload_member_state()
+    await ctx.respond(f"✅ Imported {summary}. Run `!fixnicks` to refresh nicknames.")
+
+async def snapshot_storage():
+    """Periodically persist the in-memory storage engine"""
+    while True:
+        await asyncio.sleep(storage_engine.snapshot_interval)
+        try:
+            await asyncio.to_thread(storage_engine.snapshot)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Storage snapshot failed: {e}")
+
+async def warm_up():
+    """Deferred startup work, run while the gateway is still connecting"""
+    started = time.perf_counter()
+    bot.discrepancy_notifications.load()
+    results = await asyncio.gather(
+        asyncio.to_thread(ensure_event_baseline),
+        asyncio.to_thread(backfill_rollups),
+        warm_member_state(),
+        refresh_vouch_graph(),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Warmup step failed: {result}")
+    log_phase("warmup", started)
+
+@bot.listen("on_connect")
+async def log_gateway_connect():
+    log_phase("gateway_connect", bot.gateway_started)
+    bot.connected_at = time.perf_counter()
+
 @bot.event
 async def on_ready():
     print(f'Logged in as {bot.user.name}')
+    # Guild member chunks arrive between connect and ready
+    log_phase("member_chunking", bot.connected_at)
+    log_phase("ready", STARTUP_STARTED)
     # Add this to periodically clean old notifications:
     bot.loop.create_task(clean_old_notifications())
+    build_command_index()
+    start_outbox()
+    resume_jobs()
+
+@bot.before_invoke
+async def start_command_trace(ctx):
+    ctx.trace_span = tracer.start_root(f"command {ctx.command.qualified_name}", {
+        "command.name": ctx.command.qualified_name,
+        "command.type": "slash" if isinstance(ctx, discord.ApplicationContext) else "prefix",
+        "user.id": ctx.author.id,
+        "guild.id": ctx.guild.id if ctx.guild else 0,
+    })
+
+def finish_command_trace(ctx, error=None):
+    tracer.finish_root(getattr(ctx, "trace_span", None), error)
+
+@bot.listen("on_command_completion")
+async def trace_command_completion(ctx):
+    finish_command_trace(ctx)
+
+@bot.listen("on_application_command_completion")
+async def trace_application_command_completion(ctx):
+    finish_command_trace(ctx)
 
 @bot.event
 async def on_command_error(ctx, error):
+    finish_command_trace(ctx, error)
     # Command Not Found - Smart Suggestions
     if isinstance(error, commands.CommandNotFound):
-        # Get available commands user can run
-        available_commands = []
-        for cmd in bot.commands:
-            try:
-                if await cmd.can_run(ctx):
-                    available_commands.append(cmd.name)
-            except:
-                continue
-        
-        # Find similar commands
         invoked = ctx.invoked_with.lower()
-        suggestions = []
-        
-        # Check admin commands first if user is admin
-        if is_admin(ctx):
-            admin_commands = [cmd.name for cmd in bot.commands if cmd.checks]
-            suggestions.extend(
-                cmd for cmd in admin_commands 
-                if cmd.startswith(invoked[:3])  # Match first 3 letters
-            )
-        
-        # Check regular commands
-        regular_commands = [cmd.name for cmd in bot.commands if not cmd.checks]
-        suggestions.extend(
-            cmd for cmd in regular_commands
-            if cmd.startswith(invoked[:3])
-        )
-        
-        # Remove duplicates and the failed command itself
-        suggestions = list(set(suggestions) - {invoked})
+        suggestions = suggest_commands(invoked, is_admin(ctx))
         
         # Build response
         if suggestions:
@@ -983,19 +2462,38 @@ async def on_command_error(ctx, error):
     print(f"[ERROR] {type(error)}: {error}")
 
 @bot.event
-async def on_raw_reaction_add(payload):
-    if not hasattr(bot, 'discrepancy_notifications'):
+async def on_application_command_error(ctx, error):
+    finish_command_trace(ctx, error)
+    # Slash commands must always get a response or Discord shows "interaction failed"
+    if isinstance(error, (discord.CheckFailure, commands.CheckFailure)):
+        await ctx.respond("❌ You don't have permission to use this command.", ephemeral=True)
         return
-    
-    if payload.message_id not in bot.discrepancy_notifications:
-        return
-    
+
+    error_channel = bot.get_channel(ADMIN_ALERTS_CHANNEL_ID)
+    if error_channel:
+        await error_channel.send(
+            f"⚠️ **Error in `/{ctx.command or 'N/A'}`**\n"
+            f"• User: {ctx.author.mention}\n"
+            f"• Error: ```{str(error)[:1000]}```"
+        )
+    try:
+        await ctx.respond("❌ Something went wrong running that command.", ephemeral=True)
+    except discord.HTTPException:
+        pass
+
+    print(f"[ERROR] {type(error)}: {error}")
+
+@bot.event
+async def on_raw_reaction_add(payload):
     # Skip bot's own reactions
     if payload.user_id == bot.user.id:
         return
+
+    data = bot.discrepancy_notifications.get(payload.message_id)
+    if data is None:
+        return
     
     try:
-        data = bot.discrepancy_notifications[payload.message_id]
         guild = bot.get_guild(payload.guild_id)
         if not guild:
             return
@@ -1007,20 +2505,26 @@ async def on_raw_reaction_add(payload):
         
         # Check if reaction is from admin
         reactor = guild.get_member(payload.user_id)
-        if not reactor or not any(r.name in admin_roles for r in reactor.roles):
+        if not reactor or not any(r.name in ALERT_ROLE_NAMES for r in reactor.roles):
             return
         
         # Handle the action
         if str(payload.emoji) == "✅":
-            # Reset vouches
-            db_execute("UPDATE vouches SET vouch_count = 0 WHERE user_id = ?", (member.id,))
-            db_execute("DELETE FROM vouch_records WHERE vouched_id = ?", (member.id,))
-            
-            # Clean nickname
-            try:
-                await member.edit(nick=clean_nickname(member.display_name))
-            except discord.HTTPException:
-                pass
+            async with bot.member_locks.hold(member.id):
+                # Reset vouches
+                with db_transaction(archive=True) as conn:
+                    conn.execute("UPDATE vouches SET vouch_count = 0 WHERE user_id = ?", (member.id,))
+                    conn.execute("DELETE FROM vouch_records WHERE vouched_id = ?", (member.id,))
+                    voucharchive.purge(conn, member.id)
+                    record_event("clear", reactor.id, member.id, conn=conn)
+                refresh_member_state(member.id)
+                invalidate_vouch_graph()
+
+                # Clean nickname
+                try:
+                    await member.edit(nick=clean_nickname(member.display_name))
+                except discord.HTTPException:
+                    pass
             
             # Send confirmation where it came from
             if data['admin_id'] == guild.me.id:  # Staff channel
@@ -1028,18 +2532,52 @@ async def on_raw_reaction_add(payload):
                 if channel:
                     await channel.send(f"✅ {reactor.mention} reset vouches for {member.mention}")
             else:  # DM
-                try:
-                    await reactor.send(f"✅ Reset vouches for {member.mention}")
-                except discord.Forbidden:
-                    pass
+                enqueue_dm(reactor.id, content=f"✅ Reset vouches for {member.mention}")
         
         # Clean up
-        del bot.discrepancy_notifications[payload.message_id]
+        bot.discrepancy_notifications.remove(payload.message_id)
         
     except Exception as e:
         print(f"Reaction handling error: {e}")
-        if payload.message_id in bot.discrepancy_notifications:
-            del bot.discrepancy_notifications[payload.message_id]
+        bot.discrepancy_notifications.remove(payload.message_id)
+
+@bot.event
+async def on_member_update(before, after):
+    if before.roles != after.roles:
+        bot.alert_recipients.pop(after.guild.id, None)
+    # Role/avatar changes and our own edits don't need a sync
+    if before.display_name == after.display_name or after.bot:
+        return
+    if after.display_name == bot.expected_nicks.get(after.id):
+        return
+    schedule_nickname_sync(after)
+
+@bot.event
+async def on_member_remove(member):
+    bot.alert_recipients.pop(member.guild.id, None)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    if before.name != after.name:
+        bot.alert_recipients.pop(after.guild.id, None)
+
+@bot.event
+async def on_guild_role_delete(role):
+    bot.alert_recipients.pop(role.guild.id, None)
 
-keep_alive()
-bot.run(TOKEN)
+@bot.event
+async def on_member_join(member):
+    # Rejoining members lose their nickname, restore tags if tracked
+    if not member.bot:
+        schedule_nickname_sync(member)
+
+if __name__ == "__main__":
+    keep_alive()
+    bot.loop.create_task(warm_up())
+    if storage_engine.name == "memory":
+        bot.loop.create_task(snapshot_storage())
+    bot.gateway_started = bot.connected_at = time.perf_counter()
+    try:
+        bot.run(TOKEN)
+    finally:
+        storage_engine.close()
@@ -0,0 +1,130 @@
+"""Storage engines behind the bot's get_db().
+
+Both engines hand out a sqlite3 connection through the same context manager,
+so every command runs the same SQL against either one:
+
+* SqliteEngine - a fresh connection to the database file per use (default).
+* MemoryEngine - one shared in-memory database, loaded from the file at
+  startup and copied back to it every snapshot interval and on close. Writes
+  made after the last snapshot are lost if the process dies.
+
+reader() hands out a connection for long read-only scans (exports). On the
+memory engine it is a private copy, so a scan never holds the shared lock.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class SqliteEngine:
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self._connect()
+        try:
+            yield conn
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def reader(self):
+        return self.connection()
+
+    def snapshot(self):
+        """Nothing to do, every write already lands in the file"""
+        return self.path
+
+    def close(self):
+        pass
+
+
+class MemoryEngine:
+    name = "memory"
+
+    def __init__(self, path, snapshot_interval=60):
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.last_snapshot = 0
+        self._lock = threading.RLock()  # One connection shared by the loop, threads and Flask
+        self._conn = sqlite3.connect(":memory:", isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if os.path.exists(path):
+            disk = sqlite3.connect(path, timeout=30)
+            try:
+                disk.backup(self._conn)
+            finally:
+                disk.close()
+
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            try:
+                yield self._conn
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.rollback()
+                raise
+
+    def _copy(self):
+        """Private in-memory copy of the database; the shared lock is only held while copying"""
+        copy = sqlite3.connect(":memory:", isolation_level=None, check_same_thread=False)
+        copy.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.backup(copy)
+        return copy
+
+    @contextmanager
+    def reader(self):
+        copy = self._copy()
+        try:
+            yield copy
+        finally:
+            copy.close()
+
+    def snapshot(self):
+        """Copy the in-memory database to disk atomically; returns the file path"""
+        tmp_path = f"{self.path}.snapshot"
+        copy = self._copy()
+        try:
+            disk = sqlite3.connect(tmp_path)
+            try:
+                copy.backup(disk)
+            finally:
+                disk.close()
+        finally:
+            copy.close()
+        os.replace(tmp_path, self.path)
+        self.last_snapshot = time.time()
+        return self.path
+
+    def close(self):
+        self.snapshot()
+        self._conn.close()
+
+
+ENGINES = {engine.name: engine for engine in (SqliteEngine, MemoryEngine)}
+
+
+def create_engine(name, path, **options):
+    try:
+        engine = ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown storage engine {name!r}, expected one of: {', '.join(ENGINES)}")
+    if engine is MemoryEngine:
+        return engine(path, **options)
+    return engine(path)
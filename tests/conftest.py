@@ -0,0 +1,84 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# The bot's modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def bot_module(tmp_path_factory):
+    """main.py imported once, with its database files in a scratch directory"""
+    directory = tmp_path_factory.mktemp("bot")
+    cwd = os.getcwd()
+    os.chdir(directory)  # DB_PATH and ARCHIVE_PATH are relative
+    os.environ.setdefault("DISCORD_TOKEN", "test")
+    import main
+    # Code under test schedules work with bot.loop, point it at the test's loop
+    type(main.bot).loop = property(lambda self: asyncio.get_running_loop())
+    yield main
+    os.chdir(cwd)
+
+
+@pytest.fixture
+def main(bot_module):
+    """The bot module with empty tables and caches"""
+    with bot_module.get_archive_db() as conn:
+        for schema in ("main", "archive"):
+            tables = conn.execute(
+                f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            ).fetchall()
+            for (name,) in tables:
+                conn.execute(f"DELETE FROM {schema}.{name}")
+    bot = bot_module.bot
+    bot.member_state = {}
+    bot.member_state_complete = False
+    bot.cooldowns = {}
+    bot.cooldowns_complete = False
+    bot.vouch_spam = {}
+    bot.expected_nicks = {}
+    bot.vouch_graph = None
+    bot.vouch_graph_task = None
+    bot.vouch_graph_pending = []
+    bot.jobs = {}
+    bot.job_cancels = set()
+    bot.member_locks = bot_module.MemberLocks()
+    return bot_module
+
+
+class FakeMember:
+    def __init__(self, user_id, name=None, admin=False):
+        self.id = user_id
+        self.name = name or f"user{user_id}"
+        self.display_name = self.name
+        self.nick = None
+        self.mention = f"<@{user_id}>"
+        self.bot = False
+        self.roles = [SimpleNamespace(name="Admin")] if admin else []
+        self.edits = []
+
+    async def edit(self, nick=None, **kwargs):
+        self.edits.append(nick)
+        self.nick = nick
+        self.display_name = nick or self.name
+
+
+class FakeCtx:
+    """Just enough of a bridge context for command callbacks"""
+
+    def __init__(self, author, channel="general", members=()):
+        self.author = author
+        self.channel = SimpleNamespace(name=channel)
+        self.guild = SimpleNamespace(id=1, name="Test guild",
+                                     get_member={m.id: m for m in members}.get)
+        self.responses = []
+        self.deferred = False
+
+    async def defer(self, **kwargs):
+        self.deferred = True
+
+    async def respond(self, content=None, **kwargs):
+        self.responses.append(content)
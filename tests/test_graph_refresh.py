@@ -0,0 +1,68 @@
+import asyncio
+import threading
+
+from conftest import FakeMember
+
+
+def slow_loads(main, monkeypatch):
+    """Make load_vouch_graph wait for a release per call; returns (started, release) lists of events"""
+    load = main.load_vouch_graph
+    started, release = [], []
+
+    def blocked_load():
+        ready, go = threading.Event(), threading.Event()
+        started.append(ready)
+        release.append(go)
+        graph = load()
+        ready.set()
+        go.wait(5)
+        return graph
+
+    monkeypatch.setattr(main, "load_vouch_graph", blocked_load)
+    return started, release
+
+
+async def wait_for(events, count):
+    while len(events) < count or not events[count - 1].is_set():
+        await asyncio.sleep(0.01)
+
+
+def test_stale_rebuild_never_replaces_a_newer_one(main, monkeypatch):
+    main.db_execute("INSERT INTO vouch_records VALUES (1, 2, 0), (2, 1, 0)")
+    started, release = slow_loads(main, monkeypatch)
+
+    async def scenario():
+        first = asyncio.ensure_future(main.refresh_vouch_graph())
+        await wait_for(started, 1)  # The first scan has read both edges
+        main.db_execute("DELETE FROM vouch_records WHERE voucher_id = 2")
+        main.invalidate_vouch_graph()
+        release[0].set()
+        await wait_for(started, 2)
+        assert main.bot.vouch_graph is None  # The stale scan was thrown away
+        release[1].set()
+        return await first
+
+    graph = asyncio.run(scenario())
+    assert len(started) == 2  # One rebuild task, rescanned once
+    assert main.bot.vouch_graph is graph
+    assert graph.has_edge(1, 2) and not graph.has_edge(2, 1)
+
+
+def test_vouches_during_a_rebuild_are_replayed(main, monkeypatch):
+    main.db_execute("INSERT INTO vouch_records VALUES (1, 2, 0)")
+    alerts = []
+    monkeypatch.setattr(main, "dispatch_admin_alert", lambda guild, member, text: alerts.append(text))
+    started, release = slow_loads(main, monkeypatch)
+
+    async def scenario():
+        main.invalidate_vouch_graph()
+        await wait_for(started, 1)
+        # Committed after the scan read the table
+        main.db_execute("INSERT INTO vouch_records VALUES (2, 1, 0)")
+        main.check_vouch_patterns(None, FakeMember(2), FakeMember(1))
+        release[0].set()
+        return await main.refresh_vouch_graph()
+
+    graph = asyncio.run(scenario())
+    assert graph.has_edge(2, 1)
+    assert any("Mutual Vouch" in text for text in alerts)
@@ -0,0 +1,110 @@
+import asyncio
+
+from conftest import FakeCtx, FakeMember
+
+
+def add_job(main, kind, cursor=0, processed=0, status="running"):
+    with main.get_db() as conn:
+        job_id = conn.execute("""
+            INSERT INTO jobs (kind, guild_id, actor_id, status, cursor, processed, created_at, updated_at)
+            VALUES (?, 1, 99, ?, ?, ?, 0, 0)
+            """, (kind, status, cursor, processed)).lastrowid
+    return job_id
+
+
+def admin_records(main):
+    return sorted(row[0] for row in main.db_fetchall("SELECT vouched_id FROM vouch_records WHERE voucher_id = 99"))
+
+
+def test_reconcile_one_member_reports_what_was_written(main):
+    main.db_execute("INSERT INTO vouches VALUES (5, 3, 1)")
+    main.db_execute("INSERT INTO vouch_records VALUES (7, 5, 0)")
+    admin = FakeMember(99, admin=True)
+
+    ctx = FakeCtx(admin)
+    asyncio.run(main.reconcile_vouches.callback(ctx, FakeMember(5)))
+    assert ctx.responses == ["⚠️ Added 1 admin record for <@5>, still 1 short of their vouch count"]
+    assert main.count_vouch_records(5) == 2
+
+    # The pair exists now, a second run writes nothing
+    ctx = FakeCtx(admin)
+    asyncio.run(main.reconcile_vouches.callback(ctx, FakeMember(5)))
+    assert ctx.responses == ["⚠️ Added 0 admin record for <@5>, still 1 short of their vouch count"]
+    assert main.count_vouch_records(5) == 2
+
+
+def test_reconcile_skips_pairs_already_archived(main):
+    main.db_execute("INSERT INTO vouches VALUES (5, 2, 1)")
+    with main.get_archive_db() as conn:
+        conn.execute("INSERT INTO archive.vouch_records VALUES (99, 5, 0, 0)")
+        conn.execute("INSERT INTO main.vouch_archive_counts VALUES (5, 1)")
+
+    assert asyncio.run(main.reconcile_step({'actor_id': 99}, None, 5)) == 0
+    assert admin_records(main) == []
+
+
+def test_fix_vouch_records_counts_rows_changed(main):
+    main.db_execute("INSERT INTO vouches VALUES (5, 3, 1), (6, 1, 1)")
+    main.db_execute("INSERT INTO vouch_records VALUES (7, 6, 0), (8, 6, 0), (9, 6, 0)")
+
+    ctx = FakeCtx(FakeMember(99, admin=True))
+    asyncio.run(main.fix_vouch_records.callback(ctx))
+
+    # One admin record for user 5, two excess records removed for user 6
+    assert ctx.responses == ["✅ Fixed 3 vouch record mismatches!"]
+    assert admin_records(main) == [5]
+    assert main.count_vouch_records(6) == 1
+
+
+def test_job_resumes_from_its_saved_cursor(main, monkeypatch):
+    main.db_execute("INSERT INTO vouches VALUES (1, 1, 1), (2, 1, 1), (3, 1, 1), (4, 1, 1)")
+    monkeypatch.setattr(main, "JOB_CHECKPOINT", 1)
+    monkeypatch.setattr(main.bot, "get_guild", lambda guild_id: FakeCtx(None).guild)
+    step = main.reconcile_step
+    stop_at = [3]
+
+    async def step_until_shutdown(job, guild, user_id):
+        if user_id in stop_at:
+            raise asyncio.CancelledError  # The bot stops mid-sweep
+        return await step(job, guild, user_id)
+
+    monkeypatch.setitem(main.JOB_KINDS["reconcile_vouches"], "step", step_until_shutdown)
+    job_id = add_job(main, "reconcile_vouches", status="queued")
+
+    async def run():
+        main.resume_jobs()
+        task = main.bot.jobs[job_id]['task']
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    saved = main.load_job(job_id)
+    assert (saved['status'], saved['cursor'], saved['processed'], saved['changed']) == ("running", 2, 2, 2)
+    assert admin_records(main) == [1, 2]
+
+    # The next start picks the job up after user 2
+    main.bot.jobs = {}
+    stop_at.clear()
+    calls = []
+    monkeypatch.setitem(main.JOB_KINDS["reconcile_vouches"], "step",
+                        lambda job, guild, user_id: calls.append(user_id) or step(job, guild, user_id))
+    asyncio.run(run())
+
+    done = main.load_job(job_id)
+    assert calls == [3, 4]
+    assert (done['status'], done['cursor'], done['processed'], done['total'], done['changed']) == ("done", 4, 4, 4, 4)
+    assert admin_records(main) == [1, 2, 3, 4]
+
+
+def test_cancelled_jobs_are_not_resumed(main):
+    main.db_execute("INSERT INTO vouches VALUES (1, 1, 1)")
+    add_job(main, "reconcile_vouches", status="cancelled")
+    add_job(main, "unknown_kind")
+
+    async def run():
+        main.resume_jobs()
+
+    asyncio.run(run())
+    assert main.bot.jobs == {}
@@ -0,0 +1,75 @@
+import asyncio
+
+from conftest import FakeCtx, FakeMember
+
+
+def test_same_member_is_serialized(main):
+    locks = main.MemberLocks(stripes=4)
+    log = []
+
+    async def change(name):
+        async with locks.hold(5):
+            log.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            log.append(f"{name} end")
+
+    async def scenario():
+        await asyncio.gather(change("a"), change("b"))
+
+    asyncio.run(scenario())
+    assert log == ["a start", "a end", "b start", "b end"]
+    stats = locks.stats()
+    assert (stats['acquired'], stats['contended'], stats['held']) == (2, 1, 0)
+    assert stats['hot_members'] == [(5, 1)]
+
+
+def test_other_stripes_do_not_wait(main):
+    locks = main.MemberLocks(stripes=4)
+
+    async def other():
+        async with locks.hold(2):
+            pass
+
+    async def scenario():
+        async with locks.hold(1):
+            # Member 2 is on another stripe, this must not block
+            await asyncio.wait_for(other(), 1)
+
+    asyncio.run(scenario())
+    assert locks.stats()['contended'] == 0
+
+
+def test_pairs_in_opposite_order_do_not_deadlock(main):
+    locks = main.MemberLocks(stripes=4)
+
+    async def swap(first, second):
+        async with locks.hold(first, second):
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        await asyncio.wait_for(asyncio.gather(*(swap(1, 2) if i % 2 else swap(2, 1) for i in range(10))), 5)
+        # Two members sharing a stripe take it once
+        await asyncio.wait_for(swap(1, 5), 1)
+
+    asyncio.run(scenario())
+    assert locks.stats()['held'] == 0
+
+
+def test_lockstats_reports_and_resets(main):
+    main.bot.member_locks = main.MemberLocks(stripes=4)
+
+    async def contend():
+        async def hold():
+            async with main.bot.member_locks.hold(3):
+                await asyncio.sleep(0.01)
+        await asyncio.gather(hold(), hold())
+
+    asyncio.run(contend())
+    ctx = FakeCtx(FakeMember(1, admin=True), members=[FakeMember(3)])
+    asyncio.run(main.lockstats.callback(ctx, "reset"))
+
+    text = ctx.responses[0]
+    assert "2 acquired, 1 waited, 0 held now" in text
+    assert "<@3>: 1 waits" in text
+    assert "Counters reset" in text
+    assert main.bot.member_locks.stats()['acquired'] == 0
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+
+def test_warm_up_keeps_entries_refreshed_during_the_scan(main, monkeypatch):
+    main.db_execute("INSERT INTO vouches VALUES (1, 3, 1), (2, 4, 0)")
+    main.db_execute("INSERT INTO vouch_cooldowns VALUES (1, 100)")
+    scan = main.scan_member_state
+
+    def scan_then_vouch(conn):
+        state = scan(conn)
+        # A vouch lands after the scan read user 1
+        main.db_execute("UPDATE vouches SET vouch_count = 4 WHERE user_id = 1")
+        main.refresh_member_state(1)
+        return state
+
+    monkeypatch.setattr(main, "scan_member_state", scan_then_vouch)
+    asyncio.run(main.warm_member_state())
+
+    assert main.bot.member_state_complete
+    assert main.get_member_state(1) == (4, True, False)
+    assert main.get_member_state(2) == (4, False, False)
+    assert main.get_member_state(3) == (0, False, False)
+    assert main.get_last_vouch_time(1) == 100
+
+
+def test_reload_discards_a_superseded_warm_up(main, monkeypatch):
+    main.db_execute("INSERT INTO vouches VALUES (1, 3, 1)")
+    main.db_execute("INSERT INTO vouch_cooldowns VALUES (1, 100)")
+    scan = main.scan_member_state
+    first_scanned, release_first = threading.Event(), threading.Event()
+    calls = []
+
+    def scan_member_state(conn):
+        calls.append(1)
+        state = scan(conn)
+        if len(calls) == 1:
+            first_scanned.set()
+            release_first.wait(5)
+        return state
+
+    monkeypatch.setattr(main, "scan_member_state", scan_member_state)
+
+    async def scenario():
+        first = asyncio.ensure_future(main.warm_member_state())
+        while not first_scanned.is_set():
+            await asyncio.sleep(0.01)
+        # An import rewrites the table while the startup warm-up is still out
+        main.db_execute("UPDATE vouches SET vouch_count = 9 WHERE user_id = 1")
+        main.db_execute("DELETE FROM vouch_cooldowns")
+        main.reload_member_state()
+        while not main.bot.member_state_complete:
+            await asyncio.sleep(0.01)
+        release_first.set()
+        await first
+
+    asyncio.run(scenario())
+    assert main.get_member_state(1) == (9, True, False)
+    assert main.get_last_vouch_time(1) is None
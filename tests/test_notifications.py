@@ -0,0 +1,61 @@
+import pytest
+
+
+@pytest.fixture
+def clock(main, monkeypatch):
+    now = [1000]
+    monkeypatch.setattr(main.time, "time", lambda: now[0])
+    return now
+
+
+def test_alerts_expire_after_the_ttl(main, clock):
+    store = main.NotificationStore(ttl=60)
+    store.add(1, 10, 20)
+    assert store.get(1)['member_id'] == 20
+
+    clock[0] += 60
+    assert store.get(1) is None
+    store.purge_expired()
+    assert len(store) == 0
+    assert main.db_fetchone("SELECT COUNT(*) FROM discrepancy_notifications")[0] == 0
+
+
+def test_re_adding_keeps_the_newer_expiry(main, clock):
+    store = main.NotificationStore(ttl=60)
+    store.add(1, 10, 20)
+    clock[0] += 30
+    store.add(1, 10, 20)
+
+    clock[0] += 40  # Past the first expiry, before the second
+    store.purge_expired()
+    assert store.get(1)['expires_at'] == 1090
+
+
+def test_alerts_over_the_cache_limit_are_read_from_disk(main, clock):
+    store = main.NotificationStore(ttl=60, cache_limit=2)
+    for message_id in (1, 2, 3):
+        clock[0] += 1
+        store.add(message_id, 10, 20 + message_id)
+
+    # The soonest-expiring alert only lives on disk now
+    assert len(store) == 2
+    assert store.get(1)['member_id'] == 21
+    store.remove(1)
+    assert store.get(1) is None
+
+    store.purge_expired()
+    assert not store._spilled  # Everything left on disk is cached again
+
+
+def test_load_restores_unexpired_alerts(main, clock):
+    store = main.NotificationStore(ttl=60)
+    store.add(1, 10, 20)
+    clock[0] += 30
+    store.add(2, 10, 21)
+    clock[0] += 40
+
+    restarted = main.NotificationStore(ttl=60)
+    restarted.load()
+    assert restarted.get(1) is None
+    assert restarted.get(2)['member_id'] == 21
+    assert len(restarted) == 1
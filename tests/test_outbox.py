@@ -0,0 +1,108 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+
+class FakeUser:
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    async def send(self, content=None, embed=None):
+        if self.error:
+            raise self.error
+        self.sent.append((content, embed))
+
+
+def http_error(cls, status):
+    return cls(SimpleNamespace(status=status, reason="error"), "error")
+
+
+@pytest.fixture
+def outbox(main, monkeypatch):
+    """Empty queue and closed-DM cache; returns the user every DM goes to"""
+    monkeypatch.setattr(main.bot, "outbox_queue", asyncio.Queue())
+    monkeypatch.setattr(main.bot, "dm_closed", {})
+    user = FakeUser()
+    monkeypatch.setattr(main.bot, "get_user", lambda user_id: user)
+    return user
+
+
+def deliver_queued(main):
+    async def run():
+        while not main.bot.outbox_queue.empty():
+            await main.deliver_dm(main.bot.outbox_queue.get_nowait())
+    asyncio.run(run())
+
+
+def pending(main):
+    return main.db_fetchall("SELECT user_id, attempts FROM dm_outbox")
+
+
+def test_queued_dm_is_delivered_once(main, outbox):
+    embed = discord.Embed(title="Vouch alert", description="check it")
+    assert main.enqueue_dm(5, "hello", embed)
+    deliver_queued(main)
+
+    content, sent_embed = outbox.sent[0]
+    assert content == "hello"
+    assert sent_embed.to_dict() == embed.to_dict()
+    assert pending(main) == []
+
+
+def test_closed_dms_are_remembered(main, outbox, monkeypatch):
+    outbox.error = http_error(discord.Forbidden, 403)
+    main.enqueue_dm(5, "first")
+    main.enqueue_dm(5, "second")
+    deliver_queued(main)
+
+    # The second message was dropped without another attempt
+    assert pending(main) == []
+    assert main.dms_closed(5)
+    assert not main.enqueue_dm(5, "third")
+    assert main.db_fetchone("SELECT COUNT(*) FROM dm_closed_users WHERE user_id = 5")[0] == 1
+
+    # Rechecked once the closed mark is old enough
+    marked_at = main.bot.dm_closed[5]
+    monkeypatch.setattr(main.time, "time", lambda: marked_at + main.DM_CLOSED_RECHECK)
+    assert main.enqueue_dm(5, "fourth")
+
+
+def test_failed_deliveries_back_off_then_give_up(main, outbox, monkeypatch):
+    outbox.error = http_error(discord.HTTPException, 500)
+    retries = []
+    monkeypatch.setattr(main.bot, "outbox_queue", SimpleNamespace(put_nowait=lambda outbox_id: None))
+    main.enqueue_dm(5, "hello")
+    outbox_id = main.db_fetchone("SELECT id FROM dm_outbox")[0]
+
+    async def attempt():
+        loop = asyncio.get_running_loop()
+        monkeypatch.setattr(loop, "call_later", lambda delay, *args: retries.append(delay))
+        await main.deliver_dm(outbox_id)
+
+    for _ in range(main.OUTBOX_MAX_ATTEMPTS - 1):
+        asyncio.run(attempt())
+    assert retries == [main.OUTBOX_BACKOFF * 2 ** i for i in range(main.OUTBOX_MAX_ATTEMPTS - 1)]
+    assert pending(main)[0]['attempts'] == main.OUTBOX_MAX_ATTEMPTS - 1
+
+    asyncio.run(attempt())
+    assert pending(main) == []
+
+
+def test_restart_reloads_closed_users_and_pending_dms(main, outbox):
+    main.db_execute("INSERT INTO dm_closed_users VALUES (6, ?)", (int(main.time.time()),))
+    main.enqueue_dm(5, "hello")
+    main.bot.outbox_queue = asyncio.Queue()
+    main.bot.dm_closed = {}
+
+    async def restart():
+        main.load_outbox()
+        await asyncio.sleep(0.01)  # Due DMs are queued by a zero-delay timer
+        while not main.bot.outbox_queue.empty():
+            await main.deliver_dm(main.bot.outbox_queue.get_nowait())
+
+    asyncio.run(restart())
+    assert main.dms_closed(6)
+    assert outbox.sent == [("hello", None)]
@@ -0,0 +1,119 @@
+import sqlite3
+import threading
+
+import pytest
+
+import storage
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def engine(request, tmp_path):
+    engine = storage.create_engine(request.param, str(tmp_path / "vouches.db"))
+    with engine.connection() as conn:
+        conn.execute("CREATE TABLE vouches (user_id INTEGER PRIMARY KEY, vouch_count INTEGER)")
+    yield engine
+    engine.close()
+
+
+def test_connection_round_trip(engine):
+    with engine.connection() as conn:
+        conn.execute("INSERT INTO vouches VALUES (1, 5)")
+    with engine.connection() as conn:
+        row = conn.execute("SELECT vouch_count FROM vouches WHERE user_id = 1").fetchone()
+    assert row["vouch_count"] == 5
+
+
+def test_failed_transaction_rolls_back(engine):
+    with pytest.raises(sqlite3.IntegrityError):
+        with engine.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT INTO vouches VALUES (1, 5)")
+            conn.execute("INSERT INTO vouches VALUES (1, 6)")
+    with engine.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM vouches").fetchone()[0] == 0
+
+
+def test_reader_sees_committed_rows(engine):
+    with engine.connection() as conn:
+        conn.execute("INSERT INTO vouches VALUES (1, 5)")
+    with engine.reader() as conn:
+        assert conn.execute("SELECT vouch_count FROM vouches").fetchone()[0] == 5
+
+
+def test_snapshot_persists_to_file(engine, tmp_path):
+    with engine.connection() as conn:
+        conn.execute("INSERT INTO vouches VALUES (1, 5)")
+    path = engine.snapshot()
+    disk = sqlite3.connect(path)
+    try:
+        assert disk.execute("SELECT vouch_count FROM vouches").fetchone()[0] == 5
+    finally:
+        disk.close()
+
+
+def test_memory_engine_loads_existing_file(tmp_path):
+    path = str(tmp_path / "vouches.db")
+    first = storage.MemoryEngine(path)
+    with first.connection() as conn:
+        conn.execute("CREATE TABLE t (x)")
+        conn.execute("INSERT INTO t VALUES (1)")
+    first.close()
+
+    second = storage.MemoryEngine(path)
+    with second.connection() as conn:
+        assert conn.execute("SELECT x FROM t").fetchone()[0] == 1
+    second.close()
+
+
+def test_memory_reader_does_not_hold_the_lock(tmp_path):
+    engine = storage.MemoryEngine(str(tmp_path / "vouches.db"))
+    with engine.connection() as conn:
+        conn.execute("CREATE TABLE t (x)")
+    wrote = threading.Event()
+
+    def write():
+        with engine.connection() as conn:
+            conn.execute("INSERT INTO t VALUES (1)")
+        wrote.set()
+
+    with engine.reader() as conn:
+        thread = threading.Thread(target=write)
+        thread.start()
+        assert wrote.wait(5)
+        # The reader is a copy taken before the write
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    thread.join()
+    engine.close()
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        storage.create_engine("redis", "vouches.db")
+
+
+def test_bot_scans_leave_the_memory_engine_lock_free(main, monkeypatch, tmp_path):
+    main.db_execute("INSERT INTO vouches VALUES (1, 1, 1)")
+    main.db_execute("INSERT INTO vouch_records VALUES (2, 1, 100)")
+    path = str(tmp_path / "memory.db")
+    with main.get_db() as conn:
+        conn.execute("VACUUM INTO ?", (path,))
+    engine = storage.MemoryEngine(path)
+    monkeypatch.setattr(main, "storage_engine", engine)
+
+    def probe(rows):
+        # Another thread (the event loop in the bot) can still run queries mid-scan
+        rows = list(rows)
+        thread = threading.Thread(target=main.db_fetchone, args=("SELECT 1",))
+        thread.start()
+        thread.join(5)
+        assert not thread.is_alive()
+        return rows
+
+    monkeypatch.setattr(main.vouchgraph, "VouchGraph", probe)
+    assert main.load_vouch_graph() == [(2, 1)]
+
+    scan_cooldowns = main.scan_cooldowns
+    monkeypatch.setattr(main, "scan_cooldowns", lambda conn: probe([scan_cooldowns(conn)])[0])
+    state, cooldowns = main.scan_warm_state()
+    assert state == {1: (1, True, False)} and cooldowns == {}
+    engine._conn.close()
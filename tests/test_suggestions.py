@@ -0,0 +1,44 @@
+import random
+import string
+
+import pytest
+
+
+@pytest.mark.parametrize("a, b, distance", [
+    ("", "", 0), ("vouch", "", 5), ("vouch", "vouch", 0), ("vouhc", "vouch", 2),
+    ("kitten", "sitting", 3), ("stats", "status", 1),
+])
+def test_edit_distance(main, a, b, distance):
+    assert main.edit_distance(a, b) == distance
+    assert main.edit_distance(b, a) == distance
+
+
+def test_fuzzy_lookup_matches_a_full_scan(main):
+    rng = random.Random(7)
+    words = ["".join(rng.choice("abcde") for _ in range(rng.randint(1, 8))) for _ in range(300)]
+    index = main.CommandIndex(words)
+    for _ in range(50):
+        word = "".join(rng.choice("abcdef") for _ in range(rng.randint(1, 8)))
+        for max_dist in (1, 2, 3):
+            expected = {(main.edit_distance(word, name), name) for name in set(words)}
+            expected = {match for match in expected if match[0] <= max_dist}
+            assert set(index.fuzzy(word, max_dist)) == expected
+
+
+def test_prefix_lookup(main):
+    index = main.CommandIndex(["vouch", "vouch_history", "vouch_sources", "vouches", "voucher", "stats"])
+    assert index.prefixed("vouch_") == ["vouch_history", "vouch_sources"]
+    assert index.prefixed("z") == []
+    assert main.CommandIndex([]).fuzzy("vouch", 2) == []
+
+
+def test_suggestions_respect_permissions(main):
+    main.bot.command_index = None
+    assert main.suggest_commands("vouhc", admin=False)[0] == "vouch"
+    # Truncated names match by prefix
+    assert "vouch_sources" in main.suggest_commands("vouch_sour", admin=False)
+    assert main.suggest_commands("reconcile_vouche", admin=True) == ["reconcile_vouches"]
+    assert "reconcile_vouches" not in main.suggest_commands("reconcile_vouche", admin=False)
+    # A name is never suggested for itself
+    assert "vouch" not in main.suggest_commands("vouch", admin=False)
+    assert main.suggest_commands("".join(string.ascii_lowercase), admin=True) == []
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+
+import discord
+import pytest
+from discord import http
+from discord.webhook import async_
+
+import tracing
+
+
+@pytest.fixture
+def make_tracer(tmp_path):
+    """Tracer writing to its own file; returns (tracer, read_traces)"""
+    def make(**kwargs):
+        # Loggers are per service name, keep test tracers apart
+        service_name = f"test-{os.urandom(4).hex()}"
+        directory = str(tmp_path / service_name)
+        tracer = tracing.Tracer(directory, service_name=service_name, **kwargs)
+
+        def read_traces():
+            path = os.path.join(directory, "traces.jsonl")
+            if not os.path.exists(path):
+                return []
+            with open(path) as f:
+                return [json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"] for line in f]
+        return tracer, read_traces
+    return make
+
+
+def test_only_sampled_slow_or_failed_traces_are_exported(make_tracer):
+    tracer, read_traces = make_tracer(sample_rate=0, slow_ms=1000)
+    tracer.finish_root(tracer.start_root("command fast"))
+    assert read_traces() == []
+
+    slow = tracer.start_root("command slow")
+    slow.start_ns -= 2_000_000_000
+    tracer.finish_root(slow)
+    tracer.finish_root(tracer.start_root("command broken"), ValueError("bad input"))
+
+    traces = read_traces()
+    assert [spans[0]["name"] for spans in traces] == ["command slow", "command broken"]
+    assert traces[1][0]["status"] == {"code": tracing.STATUS_ERROR, "message": "ValueError: bad input"}
+
+    tracer, read_traces = make_tracer(sample_rate=1)
+    tracer.finish_root(tracer.start_root("command fast"))
+    assert len(read_traces()) == 1
+
+
+def test_spans_nest_under_the_current_span(make_tracer):
+    tracer, read_traces = make_tracer(sample_rate=1)
+    with tracer.span("outside") as span:
+        assert span is None  # No command is being traced
+
+    def query():
+        with tracer.span("inner"):
+            pass
+
+    async def command():
+        root = tracer.start_root("command vouch", {"user.id": 5})
+        with tracer.span("outer"):
+            # Threads started with to_thread inherit the current span
+            await asyncio.to_thread(query)
+        with pytest.raises(KeyError), tracer.span("failing"):
+            raise KeyError("missing")
+        tracer.finish_root(root)
+        with tracer.span("after"):
+            pass  # Spans after the root ends are not recorded
+
+    asyncio.run(command())
+    spans = {span["name"]: span for span in read_traces()[0]}
+    assert set(spans) == {"command vouch", "outer", "inner", "failing"}
+    root = spans["command vouch"]
+    assert root["parentSpanId"] == "" and root["kind"] == tracing.SPAN_KIND_SERVER
+    assert root["attributes"] == [{"key": "user.id", "value": {"intValue": "5"}}]
+    assert spans["outer"]["parentSpanId"] == root["spanId"]
+    assert spans["inner"]["parentSpanId"] == spans["outer"]["spanId"]
+    assert spans["failing"]["status"]["code"] == tracing.STATUS_ERROR
+    assert len({span["traceId"] for span in spans.values()}) == 1
+
+
+@pytest.fixture
+def fake_requests(monkeypatch):
+    """Stand-in request methods, restored after the test"""
+    async def request(self, route, *args, **kwargs):
+        return route.path
+
+    monkeypatch.setattr(http.HTTPClient, "request", request)
+    monkeypatch.setattr(async_.AsyncWebhookAdapter, "request", request)
+    return request
+
+
+def test_untested_pycord_versions_are_left_alone(make_tracer, fake_requests, monkeypatch):
+    tracer, _ = make_tracer()
+    monkeypatch.setattr(discord, "version_info", discord.version_info._replace(major=3, minor=0))
+    assert not tracing.instrument_discord(tracer)
+    assert http.HTTPClient.request is fake_requests
+
+
+def test_discord_requests_become_client_spans(make_tracer, fake_requests, monkeypatch):
+    tracer, read_traces = make_tracer(sample_rate=1)
+    monkeypatch.setattr(discord, "version_info", discord.version_info._replace(major=2, minor=8))
+    assert tracing.instrument_discord(tracer)
+
+    async def command():
+        root = tracer.start_root("command vouch")
+        route = SimpleNamespace(method="PATCH", path="/guilds/{guild_id}/members/{user_id}")
+        assert await http.HTTPClient.request(None, route) == route.path
+        await async_.AsyncWebhookAdapter.request(None, SimpleNamespace(method="GET", path="/gateway"))
+        tracer.finish_root(root)
+
+    asyncio.run(command())
+    spans = read_traces()[0]
+    assert [(span["name"], span["kind"]) for span in spans[:2]] == [
+        ("member.edit", tracing.SPAN_KIND_CLIENT), ("discord GET /gateway", tracing.SPAN_KIND_CLIENT)]
+
+
+def test_each_query_is_one_span(main, make_tracer, monkeypatch):
+    tracer, read_traces = make_tracer(sample_rate=1)
+    monkeypatch.setattr(main, "tracer", tracer)
+    root = tracer.start_root("command vouches")
+    main.db_execute("INSERT INTO vouches VALUES (5, 2, 1)")
+    main.get_vouches(5)
+    tracer.finish_root(root)
+
+    spans = read_traces()[0]
+    queries = [span for span in spans if span["name"] == "db.query"]
+    assert len(queries) == 2
+    assert all(span["parentSpanId"] == spans[-1]["spanId"] for span in queries)
@@ -0,0 +1,73 @@
+import asyncio
+
+from conftest import FakeCtx, FakeMember
+
+
+def counts(main):
+    return dict(main.db_fetchall("SELECT user_id, vouch_count FROM vouches WHERE vouch_count > 0"))
+
+
+def log(main, *events):
+    for kind, user_id, value in events:
+        main.record_event(kind, 99, user_id, value)
+
+
+EVENTS = [("vouch", 1, 1), ("vouch", 1, 1), ("set", 2, 5), ("vouch", 2, 1),
+          ("unvouchable", 3, 1), ("clear", 1, None), ("vouch", 1, 1), ("unvouchable", 3, 0),
+          ("unvouchable", 4, 1)]
+
+
+def test_replay_rebuilds_counts(main):
+    log(main, *EVENTS)
+    main.db_execute("INSERT INTO vouches VALUES (1, 40, 1), (7, 3, 0)")
+    main.db_execute("INSERT INTO unvouchable_users VALUES (3)")
+
+    changed, last_seq = main.apply_vouch_replay()
+
+    assert counts(main) == {1: 1, 2: 6}
+    assert {row[0] for row in main.db_fetchall("SELECT user_id FROM unvouchable_users")} == {4}
+    assert changed == {1, 2, 3, 4, 7}
+    assert last_seq == len(EVENTS)
+    # Replaying again is a no-op
+    assert main.apply_vouch_replay()[0] == set()
+
+
+def test_snapshot_replay_matches_full_replay(main):
+    log(main, *EVENTS[:5])
+    full = main.replay_vouch_events()
+    assert main.take_vouch_snapshot()
+    assert not main.take_vouch_snapshot()  # Nothing new since
+    assert main.db_fetchone("SELECT COUNT(*) FROM vouch_events")[0] == 5
+    assert main.replay_vouch_events() == full
+
+    log(main, *EVENTS[5:], ("clear_all", None, None), ("vouch", 8, 1))
+    counts_, unvouchable, _ = main.replay_vouch_events()
+    assert counts_ == {8: 1}
+    assert unvouchable == {4}
+
+
+def test_vouch_writes_everything_or_nothing(main):
+    voucher, target = FakeMember(10), FakeMember(20)
+    main.db_execute("INSERT INTO vouches VALUES (20, 0, 1)")
+    main.db_execute("""
+        CREATE TRIGGER fail_cooldown BEFORE INSERT ON vouch_cooldowns
+        BEGIN SELECT RAISE(ABORT, 'disk full'); END
+        """)
+    try:
+        ctx = FakeCtx(voucher)
+        asyncio.run(main.vouch.callback(ctx, target, reason="smooth trade"))
+    finally:
+        main.db_execute("DROP TRIGGER fail_cooldown")
+
+    assert ctx.responses[-1] == "❌ Database error!"
+    assert main.get_vouches(20) == 0
+    for table in ("vouch_events", "vouch_records", "vouch_reasons", "vouch_cooldowns", "voucher_daily"):
+        assert main.db_fetchone(f"SELECT COUNT(*) FROM {table}")[0] == 0, table
+    assert main.get_last_vouch_time(10) is None
+
+    ctx = FakeCtx(voucher)
+    asyncio.run(main.vouch.callback(ctx, target, reason="smooth trade"))
+    assert main.get_vouches(20) == 1
+    assert main.has_vouched(10, 20)
+    assert main.get_last_vouch_time(10) is not None
+    assert main.db_fetchone("SELECT reason FROM vouch_reasons")[0] == "smooth trade"
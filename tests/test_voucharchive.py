@@ -0,0 +1,95 @@
+import sqlite3
+
+import pytest
+
+import voucharchive
+
+OLD = 1_000_000
+NEW = 2_000_000
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "vouches.db"), isolation_level=None)
+    conn.execute("""
+        CREATE TABLE vouch_records (
+            voucher_id INTEGER, vouched_id INTEGER, timestamp INTEGER DEFAULT 0,
+            PRIMARY KEY (voucher_id, vouched_id))
+        """)
+    conn.execute("""
+        CREATE TABLE vouch_reasons (
+            voucher_id INTEGER, vouched_id INTEGER, reason TEXT, timestamp INTEGER,
+            PRIMARY KEY (voucher_id, vouched_id))
+        """)
+    conn.execute("CREATE TABLE vouch_archive_counts (vouched_id INTEGER PRIMARY KEY, archived INTEGER DEFAULT 0)")
+    conn.executemany("INSERT INTO vouch_records VALUES (?, ?, ?)",
+                     [(1, 10, OLD), (2, 10, OLD), (3, 10, NEW), (4, 10, 0), (1, 20, OLD)])
+    conn.executemany("INSERT INTO vouch_reasons VALUES (?, ?, ?, ?)",
+                     [(1, 10, "legit trade", OLD), (3, 10, "recent", NEW)])
+    voucharchive.attach(conn, str(tmp_path / "archive.db"))
+    yield conn
+    conn.close()
+
+
+def count(conn, table):
+    return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_compress_round_trip():
+    assert voucharchive.decompress(voucharchive.compress("great trader ✅")) == "great trader ✅"
+    assert voucharchive.compress(None) is None
+
+
+def test_archive_batch_moves_old_rows(conn):
+    assert voucharchive.archive_batch(conn, NEW - 1, NEW) == (3, 1)
+    # Recent rows and rows of unknown age (timestamp 0) stay hot
+    assert sorted(conn.execute("SELECT voucher_id FROM main.vouch_records WHERE vouched_id = 10")) == [(3,), (4,)]
+    assert count(conn, "archive.vouch_records") == 3
+    assert dict(conn.execute("SELECT * FROM vouch_archive_counts").fetchall()) == {10: 2, 20: 1}
+    reason = conn.execute("SELECT zdecompress(reason) FROM archive.vouch_reasons").fetchone()[0]
+    assert reason == "legit trade"
+    assert voucharchive.has_record(conn, 1, 10)
+    assert voucharchive.archive_batch(conn, NEW - 1, NEW) == (0, 0)
+
+
+def test_archive_batch_respects_batch_size(conn):
+    assert voucharchive.archive_batch(conn, NEW - 1, NEW, batch_size=2)[0] == 2
+    assert voucharchive.archive_batch(conn, NEW - 1, NEW, batch_size=2)[0] == 1
+
+
+def test_purge(conn):
+    voucharchive.archive_batch(conn, NEW - 1, NEW)
+    voucharchive.purge(conn, 10)
+    assert count(conn, "archive.vouch_records") == 1
+    assert dict(conn.execute("SELECT * FROM vouch_archive_counts").fetchall()) == {20: 1}
+    voucharchive.purge(conn)
+    assert count(conn, "archive.vouch_records") == 0
+    assert count(conn, "vouch_archive_counts") == 0
+
+
+def test_drop_hot_duplicates(conn):
+    voucharchive.archive_batch(conn, NEW - 1, NEW)
+    # Simulate a lost hot delete: the archived rows are back in the hot table
+    conn.executemany("INSERT INTO main.vouch_records VALUES (?, ?, ?)", [(1, 10, OLD), (2, 10, OLD)])
+    conn.execute("DELETE FROM vouch_archive_counts")
+    assert voucharchive.drop_hot_duplicates(conn) == 2
+    assert count(conn, "main.vouch_records") == 2
+    assert dict(conn.execute("SELECT * FROM vouch_archive_counts").fetchall()) == {10: 2, 20: 1}
+
+
+def test_tier_sizes(conn):
+    voucharchive.archive_batch(conn, NEW - 1, NEW)
+    assert voucharchive.tier_sizes(conn) == {
+        "main.vouch_records": 2, "main.vouch_reasons": 1,
+        "archive.vouch_records": 3, "archive.vouch_reasons": 1,
+    }
+
+
+def test_trim(conn):
+    voucharchive.archive_batch(conn, NEW - 1, NEW)
+    conn.execute("UPDATE archive.vouch_records SET timestamp = timestamp + voucher_id")
+    assert voucharchive.trim(conn, 10, 1) == 1
+    assert [r[0] for r in conn.execute("SELECT voucher_id FROM archive.vouch_records WHERE vouched_id = 10")] == [2]
+    assert voucharchive.trim(conn, 10, 5, newest=True) == 1
+    assert dict(conn.execute("SELECT * FROM vouch_archive_counts").fetchall()) == {20: 1}
+    assert voucharchive.trim(conn, 10, 5) == 0
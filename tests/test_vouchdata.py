@@ -0,0 +1,161 @@
+import json
+import sqlite3
+
+import pytest
+
+import vouchdata
+
+SCHEMA = """
+CREATE TABLE vouches (user_id INTEGER PRIMARY KEY, vouch_count INTEGER DEFAULT 0, tracking_enabled INTEGER DEFAULT 0);
+CREATE TABLE vouch_records (
+    voucher_id INTEGER, vouched_id INTEGER, timestamp INTEGER DEFAULT 0,
+    PRIMARY KEY (voucher_id, vouched_id));
+CREATE TABLE vouch_reasons (
+    voucher_id INTEGER, vouched_id INTEGER, reason TEXT, timestamp INTEGER,
+    PRIMARY KEY (voucher_id, vouched_id));
+CREATE TABLE unvouchable_users (user_id INTEGER PRIMARY KEY);
+CREATE TABLE vouch_archive_counts (vouched_id INTEGER PRIMARY KEY, archived INTEGER DEFAULT 0);
+"""
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = str(tmp_path / "source.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.executemany("INSERT INTO vouches VALUES (?, ?, ?)", [(1, 2, 1), (2, 0, None)])
+    conn.executemany("INSERT INTO vouch_records VALUES (?, ?, ?)", [(5, 1, 100), (6, 1, 200)])
+    conn.execute("INSERT INTO vouch_reasons VALUES (5, 1, '', 100)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def rows(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(conn.execute(f"SELECT * FROM {table}").fetchall())
+    finally:
+        conn.close()
+
+
+def write_jsonl(path, records):
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_jsonl_round_trip_into_empty_database(source, tmp_path, batched):
+    export = str(tmp_path / "export.jsonl.gz")
+    assert vouchdata.export_file(source, export) == 5
+    target = str(tmp_path / "target.db")
+
+    counts = vouchdata.import_file(target, export, batched=batched)
+
+    assert counts == {"vouches": 2, "vouch_records": 2, "vouch_reasons": 1}
+    for table in ("vouches", "vouch_records", "vouch_reasons"):
+        assert rows(target, table) == rows(source, table)
+
+
+def test_csv_round_trip_keeps_nulls_and_empty_text(source, tmp_path):
+    for table in ("vouches", "vouch_reasons"):
+        export = str(tmp_path / f"{table}.csv")
+        vouchdata.export_file(source, export, table)
+        target = str(tmp_path / "target.db")
+        if table == "vouches":
+            conn = sqlite3.connect(target)
+            conn.executescript(SCHEMA)
+            conn.close()
+        vouchdata.import_file(target, export, table)
+        # NULL tracking_enabled stays NULL, the empty reason stays ''
+        assert rows(target, table) == rows(source, table)
+
+
+def test_csv_needs_a_known_table(source, tmp_path):
+    with pytest.raises(ValueError):
+        vouchdata.export_file(source, str(tmp_path / "x.csv"))
+    with pytest.raises(ValueError):
+        vouchdata.export_file(source, str(tmp_path / "x.csv"), "sqlite_master")
+    with pytest.raises(ValueError):
+        vouchdata.import_file(source, str(tmp_path / "x.csv"), "jobs")
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_import_rejects_bad_columns_before_writing(source, tmp_path, batched):
+    path = str(tmp_path / "bad.jsonl")
+    write_jsonl(path, [
+        {"table": "vouches", "row": {"user_id": 9, "vouch_count": 1, "tracking_enabled": 1}},
+        {"table": "vouches", "row": {"user_id": 10, "vouch_count) VALUES (1); DROP TABLE vouches; --": 1}},
+    ])
+    with pytest.raises(ValueError, match="Unknown columns"):
+        vouchdata.import_file(source, path, batched=batched)
+    assert 9 not in [row[0] for row in rows(source, "vouches")]
+
+
+@pytest.mark.parametrize("schema", [
+    "CREATE TABLE jobs (id INTEGER); DROP TABLE vouches",
+    "CREATE TRIGGER jobs AFTER INSERT ON vouches BEGIN DELETE FROM vouches; END",
+    "CREATE TABLE other (id INTEGER)",
+])
+def test_import_refuses_anything_but_a_plain_create_table(source, tmp_path, schema):
+    conn = sqlite3.connect(source)
+    conn.execute("DROP TABLE unvouchable_users")
+    conn.close()
+    path = str(tmp_path / "bad.jsonl")
+    write_jsonl(path, [{"table": "unvouchable_users", "schema": schema.replace("jobs", "unvouchable_users")}])
+    with pytest.raises(ValueError, match="Refusing schema"):
+        vouchdata.import_file(source, path)
+    assert len(rows(source, "vouches")) == 2
+
+
+def test_unknown_tables_are_skipped(source, tmp_path):
+    path = str(tmp_path / "extra.jsonl")
+    write_jsonl(path, [
+        {"table": "sqlite_master", "schema": "CREATE TABLE evil (x)"},
+        {"table": "jobs", "row": {"id": 1}},
+        {"table": "unvouchable_users", "row": {"user_id": 3}},
+    ])
+    assert vouchdata.import_file(source, path) == {"unvouchable_users": 1}
+
+
+def test_archive_tables_round_trip(source, tmp_path):
+    archive = str(tmp_path / "archive.db")
+    conn = sqlite3.connect(source, isolation_level=None)
+    vouchdata.voucharchive.attach(conn, archive)
+    conn.execute("INSERT INTO archive.vouch_reasons VALUES (7, 1, zcompress('old trade'), 50)")
+    conn.close()
+
+    export = str(tmp_path / "export.jsonl")
+    vouchdata.export_file(source, export, archive=archive)
+    with open(export) as f:
+        assert '"reason": "old trade"' in f.read()
+
+    target_archive = str(tmp_path / "target_archive.db")
+    counts = vouchdata.import_file(str(tmp_path / "target.db"), export, archive=target_archive)
+    assert counts["archive.vouch_reasons"] == 1
+    conn = sqlite3.connect(target_archive)
+    conn.create_function("zdecompress", 1, vouchdata.voucharchive.decompress)
+    assert conn.execute("SELECT zdecompress(reason) FROM vouch_reasons").fetchone()[0] == "old trade"
+    conn.close()
+
+    with pytest.raises(ValueError, match="need the archive"):
+        vouchdata.import_file(str(tmp_path / "no_archive.db"), export)
+
+
+def test_batched_import_lets_other_writers_in(source, tmp_path):
+    passes = []
+
+    def records():
+        passes.append(1)
+        for user_id in (20, 21, 22):
+            if len(passes) == 2 and user_id == 22:
+                # The first two batches are committed, so this write doesn't wait
+                other = sqlite3.connect(source, timeout=0)
+                other.execute("INSERT INTO unvouchable_users VALUES (99)")
+                other.commit()
+                other.close()
+            yield {"table": "unvouchable_users", "row": {"user_id": user_id}}
+
+    assert vouchdata.import_in_batches(source, records, batch_size=1) == {"unvouchable_users": 3}
+    assert [row[0] for row in rows(source, "unvouchable_users")] == [20, 21, 22, 99]
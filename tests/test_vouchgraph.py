@@ -0,0 +1,45 @@
+import vouchgraph
+
+
+def test_build_csr_sorts_targets():
+    offsets, targets = vouchgraph.build_csr(3, [0, 0, 2, 0], [2, 1, 0, 1])
+    assert list(offsets) == [0, 3, 3, 4]
+    assert list(targets) == [1, 1, 2, 0]
+
+
+def test_edges_and_reciprocity():
+    graph = vouchgraph.VouchGraph([(1, 2), (2, 1), (1, 3), (4, 4)])
+    assert graph.edge_count == 3  # Self-vouches are dropped
+    assert graph.has_edge(1, 3)
+    assert not graph.has_edge(3, 1)
+    assert graph.is_reciprocal(1, 2)
+    assert list(graph.reciprocal_pairs()) == [(1, 2)]
+
+
+def test_add_edge_overlay_and_compaction(monkeypatch):
+    monkeypatch.setattr(vouchgraph, "COMPACT_THRESHOLD", 2)
+    graph = vouchgraph.VouchGraph([(1, 2)])
+    assert graph.add_edge(2, 3)
+    assert not graph.add_edge(1, 2)  # Already known
+    assert graph.add_edge(3, 1)  # Second overlay edge triggers compaction
+    assert graph._extra_count == 0
+    assert graph.edge_count == 3
+    assert graph.has_edge(3, 1) and graph.has_edge(2, 3)
+
+
+def test_dense_clusters():
+    ring = [(a, b) for a in (1, 2, 3) for b in (1, 2, 3) if a != b]
+    graph = vouchgraph.VouchGraph(ring + [(4, 5)])
+    clusters = graph.dense_clusters()
+    assert len(clusters) == 1
+    assert clusters[0]["members"] == [1, 2, 3]
+    assert clusters[0]["density"] == 1.0
+
+
+def test_suspicious_inflow():
+    throwaways = [(100 + i, 1) for i in range(5)]
+    graph = vouchgraph.VouchGraph(throwaways + [(2, 1), (3, 2)])
+    report = graph.inflow_report(1)
+    assert report == {"user_id": 1, "vouchers": 6, "throwaway": 5, "share": 0.83}
+    assert [r["user_id"] for r in graph.suspicious_inflows()] == [1]
+    assert graph.inflow_report(999)["vouchers"] == 0
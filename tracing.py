@@ -0,0 +1,213 @@
+"""Lightweight per-command span tracing written to rotating local files.
+
+A root span is opened for each command invocation; code running inside it
+(DB queries, Discord REST calls) adds child spans through the contextvar that
+asyncio tasks and asyncio.to_thread inherit. When the root span ends the trace
+is kept if it was sampled or ran slower than slow_ms, and written as one line
+of OTLP/JSON (an ExportTraceServiceRequest) to a RotatingFileHandler.
+"""
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import random
+import time
+from contextlib import contextmanager
+
+MAX_SPANS_PER_TRACE = 1000
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+class Trace:
+    __slots__ = ("trace_id", "spans", "closed")
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans = []
+        self.closed = False
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "attributes",
+                 "start_ns", "end_ns", "status", "status_message")
+
+    def __init__(self, trace, name, parent_id="", kind=SPAN_KIND_INTERNAL, attributes=None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = STATUS_OK
+        self.status_message = ""
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, error):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"[:500]
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if not self.trace.closed and len(self.trace.spans) < MAX_SPANS_PER_TRACE:
+                self.trace.spans.append(self)
+
+    @property
+    def duration_ms(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status},
+        }
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+class Tracer:
+    def __init__(self, directory="traces", sample_rate=0.05, slow_ms=1000,
+                 max_bytes=10 * 1024 * 1024, backup_count=5, service_name="testbot", enabled=True):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.service_name = service_name
+        self.enabled = enabled
+        self._logger = None
+        if enabled:
+            os.makedirs(directory, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                os.path.join(directory, "traces.jsonl"), maxBytes=max_bytes,
+                backupCount=backup_count, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger = logging.getLogger(f"{service_name}.traces")
+            self._logger.setLevel(logging.INFO)
+            self._logger.propagate = False
+            self._logger.addHandler(handler)
+
+    def start_root(self, name, attributes=None):
+        """Open a root span and make it current for the calling task"""
+        if not self.enabled:
+            return None
+        root = Span(Trace(), name, kind=SPAN_KIND_SERVER, attributes=attributes)
+        _current_span.set(root)
+        return root
+
+    def finish_root(self, root, error=None):
+        """End a root span and export its trace if sampled or slow"""
+        if root is None or root.trace.closed:
+            return
+        if error is not None:
+            root.set_error(error)
+        root.end()
+        root.trace.closed = True
+        if (root.status == STATUS_ERROR or root.duration_ms >= self.slow_ms
+                or random.random() < self.sample_rate):
+            self._export(root.trace)
+
+    @contextmanager
+    def span(self, name, attributes=None, kind=SPAN_KIND_INTERNAL):
+        """Child span of the current span; a no-op outside a traced command"""
+        parent = _current_span.get()
+        if parent is None or parent.trace.closed:
+            yield None
+            return
+        span = Span(parent.trace, name, parent.span_id, kind, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def _export(self, trace):
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+            "scopeSpans": [{
+                "scope": {"name": self.service_name},
+                "spans": [span.to_otlp() for span in trace.spans],
+            }],
+        }]}
+        self._logger.info(json.dumps(payload, separators=(",", ":")))
+
+
+# Friendly names for the Discord REST routes commands hit most
+DISCORD_ROUTE_NAMES = {
+    ("PATCH", "/guilds/{guild_id}/members/{user_id}"): "member.edit",
+    ("PATCH", "/guilds/{guild_id}/members/@me"): "member.edit",
+    ("POST", "/users/@me/channels"): "member.send.open_dm",
+    ("POST", "/channels/{channel_id}/messages"): "channel.send",
+    ("PUT", "/channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me"): "add_reaction",
+    ("POST", "/interactions/{webhook_id}/{webhook_token}/callback"): "interaction.respond",
+    ("POST", "/webhooks/{webhook_id}/{webhook_token}"): "interaction.followup",
+}
+
+
+# py-cord releases whose private request methods instrument_discord was checked against
+PYCORD_TESTED = ((2, 5), (2, 8))
+
+
+def instrument_discord(tracer):
+    """Wrap py-cord's REST and webhook request methods in client spans.
+
+    These are private internals, so outside PYCORD_TESTED (or if either method
+    has moved) nothing is patched and False is returned.
+    """
+    import discord
+    from discord import http
+    from discord.webhook import async_
+
+    low, high = PYCORD_TESTED
+    if not low <= tuple(discord.version_info[:2]) <= high:
+        return False
+    targets = (getattr(http, "HTTPClient", None), getattr(async_, "AsyncWebhookAdapter", None))
+    if not all(callable(getattr(cls, "request", None)) for cls in targets):
+        return False
+
+    def wrap(request):
+        async def traced_request(self, route, *args, **kwargs):
+            name = DISCORD_ROUTE_NAMES.get((route.method, route.path), f"discord {route.method} {route.path}")
+            with tracer.span(name, {"http.method": route.method, "http.route": route.path},
+                             kind=SPAN_KIND_CLIENT):
+                return await request(self, route, *args, **kwargs)
+        return traced_request
+
+    for cls in targets:
+        cls.request = wrap(cls.request)
+    return True
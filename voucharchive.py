@@ -0,0 +1,200 @@
+"""Cold storage for old vouch records and reasons.
+
+Rows older than the retention age are moved out of the hot database into a
+separate SQLite file attached as the `archive` schema, reasons stored
+zlib-compressed. Vouch counts and the daily rollups never reference these
+rows, so archiving leaves every aggregate untouched; the hot database keeps a
+per-user count of archived records (vouch_archive_counts) so consistency
+checks don't need to open the archive.
+"""
+import sqlite3
+import zlib
+
+SCHEMA = "archive"
+MOVE_BATCH = 5000  # Rows moved per transaction
+
+_ready = set()  # Archive paths whose tables already exist
+
+
+def compress(text):
+    return None if text is None else zlib.compress(text.encode("utf-8"), 9)
+
+
+def decompress(blob):
+    return None if blob is None else zlib.decompress(blob).decode("utf-8")
+
+
+def attach(conn, path):
+    """Attach the archive to conn as `archive` (no-op if already attached)"""
+    if conn.execute("SELECT 1 FROM pragma_database_list WHERE name = ?", (SCHEMA,)).fetchone():
+        return
+    conn.execute(f"ATTACH DATABASE ? AS {SCHEMA}", (path,))
+    conn.create_function("zcompress", 1, compress, deterministic=True)
+    conn.create_function("zdecompress", 1, decompress, deterministic=True)
+    if path in _ready:
+        return
+    # Only takes effect while the file is new, lets purges give space back
+    conn.execute(f"PRAGMA {SCHEMA}.auto_vacuum = INCREMENTAL")
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {SCHEMA}.vouch_records (
+        voucher_id INTEGER,
+        vouched_id INTEGER,
+        timestamp INTEGER,
+        archived_at INTEGER,
+        PRIMARY KEY (voucher_id, vouched_id)
+    )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {SCHEMA}.idx_archive_vouched ON vouch_records(vouched_id)")
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {SCHEMA}.vouch_reasons (
+        voucher_id INTEGER,
+        vouched_id INTEGER,
+        reason BLOB,
+        timestamp INTEGER,
+        PRIMARY KEY (voucher_id, vouched_id)
+    )
+    """)
+    if path != ":memory:":  # Every in-memory attach is a fresh database
+        _ready.add(path)
+
+
+def archive_batch(conn, cutoff, archived_at, batch_size=MOVE_BATCH):
+    """Move up to batch_size records and reasons older than cutoff; returns (records, reasons) moved"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS archive_batch (
+                voucher_id INTEGER, vouched_id INTEGER, PRIMARY KEY (voucher_id, vouched_id))
+            """)
+        conn.execute("DELETE FROM temp.archive_batch")
+        # timestamp 0 marks legacy/admin rows of unknown age, those stay hot
+        records = conn.execute("""
+            INSERT INTO temp.archive_batch
+            SELECT voucher_id, vouched_id FROM main.vouch_records
+            WHERE timestamp > 0 AND timestamp < ? LIMIT ?
+            """, (cutoff, batch_size)).rowcount
+        if records:
+            conn.execute(f"""
+                INSERT OR REPLACE INTO {SCHEMA}.vouch_records
+                SELECT r.voucher_id, r.vouched_id, r.timestamp, ?
+                FROM main.vouch_records r JOIN temp.archive_batch USING (voucher_id, vouched_id)
+                """, (archived_at,))
+            conn.execute("""
+                DELETE FROM main.vouch_records
+                WHERE (voucher_id, vouched_id) IN (SELECT voucher_id, vouched_id FROM temp.archive_batch)
+                """)
+            conn.execute(f"""
+                INSERT OR REPLACE INTO main.vouch_archive_counts
+                SELECT vouched_id, COUNT(*) FROM {SCHEMA}.vouch_records
+                WHERE vouched_id IN (SELECT vouched_id FROM temp.archive_batch)
+                GROUP BY vouched_id
+                """)
+
+        conn.execute("DELETE FROM temp.archive_batch")
+        reasons = conn.execute("""
+            INSERT INTO temp.archive_batch
+            SELECT voucher_id, vouched_id FROM main.vouch_reasons
+            WHERE timestamp < ? LIMIT ?
+            """, (cutoff, batch_size)).rowcount
+        if reasons:
+            conn.execute(f"""
+                INSERT OR REPLACE INTO {SCHEMA}.vouch_reasons
+                SELECT r.voucher_id, r.vouched_id, zcompress(r.reason), r.timestamp
+                FROM main.vouch_reasons r JOIN temp.archive_batch USING (voucher_id, vouched_id)
+                """)
+            conn.execute("""
+                DELETE FROM main.vouch_reasons
+                WHERE (voucher_id, vouched_id) IN (SELECT voucher_id, vouched_id FROM temp.archive_batch)
+                """)
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    return records, reasons
+
+
+def drop_hot_duplicates(conn):
+    """Delete hot rows whose archive copy was committed but whose hot delete was lost.
+
+    The memory engine only persists the hot side at its next snapshot, so a
+    crash right after a batch leaves the same rows in both tiers.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        records = conn.execute(f"""
+            DELETE FROM main.vouch_records AS r WHERE EXISTS (
+                SELECT 1 FROM {SCHEMA}.vouch_records a
+                WHERE a.voucher_id = r.voucher_id AND a.vouched_id = r.vouched_id
+                  AND a.timestamp = r.timestamp)
+            """).rowcount
+        reasons = conn.execute(f"""
+            DELETE FROM main.vouch_reasons AS r WHERE EXISTS (
+                SELECT 1 FROM {SCHEMA}.vouch_reasons a
+                WHERE a.voucher_id = r.voucher_id AND a.vouched_id = r.vouched_id
+                  AND a.timestamp = r.timestamp)
+            """).rowcount
+        if records:
+            conn.execute("DELETE FROM main.vouch_archive_counts")
+            conn.execute(f"""
+                INSERT INTO main.vouch_archive_counts
+                SELECT vouched_id, COUNT(*) FROM {SCHEMA}.vouch_records GROUP BY vouched_id
+                """)
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    return records + reasons
+
+
+def purge(conn, vouched_id=None):
+    """Drop archived records (for one user, or everyone) the way clears drop hot ones"""
+    if vouched_id is None:
+        conn.execute(f"DELETE FROM {SCHEMA}.vouch_records")
+        conn.execute("DELETE FROM main.vouch_archive_counts")
+    else:
+        conn.execute(f"DELETE FROM {SCHEMA}.vouch_records WHERE vouched_id = ?", (vouched_id,))
+        conn.execute("DELETE FROM main.vouch_archive_counts WHERE vouched_id = ?", (vouched_id,))
+
+
+def trim(conn, vouched_id, limit, newest=False):
+    """Delete up to limit archived records for one user, oldest first unless newest; returns rows deleted"""
+    order = "DESC" if newest else "ASC"
+    deleted = conn.execute(f"""
+        DELETE FROM {SCHEMA}.vouch_records WHERE rowid IN (
+            SELECT rowid FROM {SCHEMA}.vouch_records WHERE vouched_id = ?
+            ORDER BY timestamp {order}, rowid {order} LIMIT ?)
+        """, (vouched_id, limit)).rowcount
+    if deleted:
+        conn.execute("UPDATE main.vouch_archive_counts SET archived = archived - ? WHERE vouched_id = ?",
+                     (deleted, vouched_id))
+        conn.execute("DELETE FROM main.vouch_archive_counts WHERE vouched_id = ? AND archived <= 0",
+                     (vouched_id,))
+    return deleted
+
+
+def backup(path, dest):
+    """Consistent copy of the archive file at path to dest"""
+    source = sqlite3.connect(path)
+    target = sqlite3.connect(dest)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def has_record(conn, voucher_id, vouched_id):
+    return conn.execute(
+        f"SELECT 1 FROM {SCHEMA}.vouch_records WHERE voucher_id = ? AND vouched_id = ?",
+        (voucher_id, vouched_id)).fetchone() is not None
+
+
+def tier_sizes(conn):
+    """Row counts per tier for the retention report"""
+    sizes = {}
+    for schema in ("main", SCHEMA):
+        for table in ("vouch_records", "vouch_reasons"):
+            sizes[f"{schema}.{table}"] = conn.execute(f"SELECT COUNT(*) FROM {schema}.{table}").fetchone()[0]
+    return sizes
@@ -0,0 +1,384 @@
+"""Streaming export/import of the vouch database.
+
+Used by the bot's export_data/import_data commands and runnable offline:
+
+    python vouchdata.py export backup.jsonl.gz
+    python vouchdata.py export vouches.csv.gz --table vouches
+    python vouchdata.py import backup.jsonl.gz --db vouches.db
+
+Tables named archive.* live in the cold archive file, which is attached when
+it exists (or --archive is given).
+"""
+import argparse
+import csv
+import functools
+import gzip
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import voucharchive
+
+EXPORT_TABLES = ["vouches", "vouch_records", "vouch_reasons", "unvouchable_users", "vouch_cooldowns",
+                 "vouch_archive_counts", "archive.vouch_records", "archive.vouch_reasons"]
+DEFAULT_ARCHIVE = "vouches_archive.db"
+# Archived reasons are stored compressed but exported as text
+EXPORT_COLUMNS = {"archive.vouch_reasons": "voucher_id, vouched_id, zdecompress(reason) AS reason, timestamp"}
+IMPORT_VALUES = {("archive.vouch_reasons", "reason"): "zcompress(?)"}
+IMPORT_BATCH_SIZE = 10000  # Rows per executemany call
+FETCH_SIZE = 5000  # Rows pulled from the cursor at a time during export
+
+
+def open_text(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+@contextmanager
+def connect(db, archive=None):
+    """db is a file path, or a zero-arg callable returning a connection context (the bot's get_db).
+
+    archive is attached to file path connections; callables attach their own.
+    """
+    if callable(db):
+        with db() as conn:
+            yield conn
+        return
+    conn = sqlite3.connect(db, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA busy_timeout = 30000")
+    try:
+        if archive:
+            voucharchive.attach(conn, archive)
+        yield conn
+    finally:
+        conn.close()
+
+
+def split_table(table):
+    """("archive", "vouch_records") for "archive.vouch_records", schema "main" when unqualified"""
+    schema, _, name = table.rpartition(".")
+    return schema or "main", name
+
+
+def attached(conn, schema):
+    return conn.execute("SELECT 1 FROM pragma_database_list WHERE name = ?", (schema,)).fetchone() is not None
+
+
+def select_rows(conn, table):
+    return conn.execute(f"SELECT {EXPORT_COLUMNS.get(table, '*')} FROM {table}")
+
+
+def iter_rows(conn, table):
+    """Yield rows of a table without loading it into memory"""
+    cursor = select_rows(conn, table)
+    columns = [c[0] for c in cursor.description]
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        for row in rows:
+            yield dict(zip(columns, row))
+
+
+def export_jsonl(db, out_path, tables=EXPORT_TABLES, archive=None):
+    """Write schema lines then one {"table", "row"} line per row; returns row count"""
+    count = 0
+    with connect(db, archive) as conn:
+        with open_text(out_path, "w") as out:
+            for table in tables:
+                schema_name, name = split_table(table)
+                if not attached(conn, schema_name):
+                    continue
+                schema = conn.execute(
+                    f"SELECT sql FROM {schema_name}.sqlite_master WHERE type = 'table' AND name = ?", (name,)
+                ).fetchone()
+                if not schema:
+                    continue
+                out.write(json.dumps({"table": table, "schema": schema[0]}) + "\n")
+                for row in iter_rows(conn, table):
+                    out.write(json.dumps({"table": table, "row": row}) + "\n")
+                    count += 1
+    return count
+
+
+def export_csv(db, out_path, table, archive=None):
+    """Write a single table as CSV with a header row; returns row count"""
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    count = 0
+    with connect(db, archive) as conn:
+        if not table_columns(conn, table):
+            raise ValueError(f"{table} doesn't exist here")
+        cursor = select_rows(conn, table)
+        with open_text(out_path, "w") as out:
+            writer = csv.writer(out)
+            writer.writerow([c[0] for c in cursor.description])
+            while rows := cursor.fetchmany(FETCH_SIZE):
+                writer.writerows(rows)
+                count += len(rows)
+    return count
+
+
+def iter_jsonl(path):
+    with open_text(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_csv(path, table, nullable=()):
+    """CSV has no NULL, so empty cells only become None in the given nullable columns"""
+    with open_text(path, "r") as f:
+        reader = csv.reader(f)
+        columns = next(reader)
+        for values in reader:
+            row = {c: (None if v == "" and c in nullable else v) for c, v in zip(columns, values)}
+            yield {"table": table, "row": row}
+
+
+def table_columns(conn, table):
+    """{name: (type, notnull, pk)} for an existing table, empty if it (or its schema) doesn't exist"""
+    schema, name = split_table(table)
+    if not attached(conn, schema):
+        return {}
+    return {row[1]: (row[2].upper(), row[3], row[5])
+            for row in conn.execute(f"PRAGMA {schema}.table_info({name})")}
+
+
+def nullable_columns(conn, table):
+    """Columns where an empty CSV cell means NULL: nullable and not text"""
+    return {name for name, (type_, notnull, pk) in table_columns(conn, table).items()
+            if not notnull and not pk and not any(t in type_ for t in ("CHAR", "CLOB", "TEXT"))}
+
+
+def create_table(conn, table, schema):
+    """Create a missing table from an export's schema line, refusing anything but a plain CREATE TABLE"""
+    if table_columns(conn, table):
+        return
+    schema_name, _ = split_table(table)
+    if schema_name != "main":
+        # Archive tables are created when the archive is attached, never from a file
+        if attached(conn, schema_name):
+            raise ValueError(f"Refusing schema for {table}: not an archive table")
+        return
+    if not re.fullmatch(rf'CREATE TABLE "?{table}"?\s*\([^;]*\)\s*', schema, re.IGNORECASE):
+        raise ValueError(f"Refusing schema for {table}: expected CREATE TABLE {table} (...)")
+    conn.execute(schema)
+
+
+def reset_rollups(conn):
+    """Mark the bot's daily vouch rollups for a rebuild from the imported records"""
+    if not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'voucher_daily'").fetchone():
+        return
+    conn.execute("DELETE FROM voucher_daily")
+    conn.execute("UPDATE vouch_daily SET vouches = 0")
+
+
+def drop_indexes(conn, tables):
+    """Drop secondary indexes on tables and return their CREATE statements"""
+    placeholders = ", ".join("?" for _ in tables)
+    indexes = conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+        f"AND sql IS NOT NULL AND tbl_name IN ({placeholders})", tables
+    ).fetchall()
+    for name, _ in indexes:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    return [sql for _, sql in indexes]
+
+
+def rebase_event_log(conn):
+    """Snapshot imported counts at the current event seq so replays keep them"""
+    if not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'vouch_snapshots'").fetchone():
+        return
+    seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM vouch_events").fetchone()[0]
+    conn.execute("DELETE FROM vouch_snapshot_counts")
+    conn.execute("DELETE FROM vouch_snapshots")
+    conn.execute("INSERT INTO vouch_snapshots VALUES (?, ?)", (seq, int(time.time())))
+    conn.execute("""
+        INSERT INTO vouch_snapshot_counts
+        SELECT ?, u.user_id, COALESCE(v.vouch_count, 0),
+               u.user_id IN (SELECT user_id FROM unvouchable_users)
+        FROM (SELECT user_id FROM vouches WHERE vouch_count > 0
+              UNION SELECT user_id FROM unvouchable_users) u
+        LEFT JOIN vouches v ON v.user_id = u.user_id
+        """, (seq,))
+
+
+def import_records(db, records, batch_size=IMPORT_BATCH_SIZE, archive=None):
+    """Upsert exported records in one transaction with index builds deferred"""
+    with connect(db, archive) as conn:
+        return _import_records(conn, records, batch_size)
+
+
+def check_columns(conn, table, columns, known_columns):
+    """Raise unless table (cached in known_columns) has every one of columns"""
+    if table not in known_columns:
+        known_columns[table] = table_columns(conn, table)
+    if not known_columns[table] and table.startswith("archive."):
+        raise ValueError(f"{table} rows need the archive, enable it before importing")
+    unknown = [c for c in columns if c not in known_columns[table]]
+    if unknown or not columns:
+        raise ValueError(f"Unknown columns for {table}: {', '.join(map(str, unknown)) or 'none given'}")
+
+
+def insert_rows(conn, table, columns, rows):
+    values = ", ".join(IMPORT_VALUES.get((table, c), "?") for c in columns)
+    conn.executemany(f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({values})", rows)
+
+
+def _import_records(conn, records, batch_size):
+    counts = {}
+    batches = {}  # (table, columns) -> pending rows
+    known_columns = {}  # table -> columns it actually has
+
+    def flush(key):
+        insert_rows(conn, *key, batches.pop(key))
+
+    try:
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("BEGIN IMMEDIATE")
+        index_sql = drop_indexes(conn, EXPORT_TABLES)
+        for record in records:
+            table = record["table"]
+            if table not in EXPORT_TABLES:
+                continue
+            if "schema" in record:
+                create_table(conn, table, record["schema"])
+                continue
+            row = record["row"]
+            key = (table, tuple(row))
+            if key not in batches:
+                check_columns(conn, table, key[1], known_columns)
+            batches.setdefault(key, []).append(tuple(row.values()))
+            counts[table] = counts.get(table, 0) + 1
+            if len(batches[key]) >= batch_size:
+                flush(key)
+        for key in list(batches):
+            flush(key)
+        for sql in index_sql:
+            conn.execute(sql)
+        rebase_event_log(conn)
+        reset_rollups(conn)
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    return counts
+
+
+@contextmanager
+def transaction(db, archive=None):
+    with connect(db, archive) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+
+def import_in_batches(db, records, batch_size=IMPORT_BATCH_SIZE, archive=None):
+    """Import committing every batch_size rows, so a live bot's writes aren't stuck behind one transaction.
+
+    records is a zero-arg callable called twice: the first pass creates
+    missing tables and checks every column before any row is written.
+    """
+    schemas = {}
+    keys = set()
+    for record in records():
+        if record["table"] not in EXPORT_TABLES:
+            continue
+        if "schema" in record:
+            schemas[record["table"]] = record["schema"]
+        else:
+            keys.add((record["table"], tuple(record["row"])))
+    known_columns = {}
+    with transaction(db, archive) as conn:
+        for table, schema in schemas.items():
+            create_table(conn, table, schema)
+        for table, columns in keys:
+            check_columns(conn, table, columns, known_columns)
+
+    counts = {}
+    batch = {}  # (table, columns) -> pending rows
+    pending = 0
+
+    def flush():
+        with transaction(db, archive) as conn:
+            for key, rows in batch.items():
+                insert_rows(conn, *key, rows)
+        batch.clear()
+
+    for record in records():
+        table = record["table"]
+        if table not in EXPORT_TABLES or "schema" in record:
+            continue
+        batch.setdefault((table, tuple(record["row"])), []).append(tuple(record["row"].values()))
+        counts[table] = counts.get(table, 0) + 1
+        pending += 1
+        if pending >= batch_size:
+            flush()
+            pending = 0
+    flush()
+    with transaction(db, archive) as conn:
+        rebase_event_log(conn)
+        reset_rollups(conn)
+    return counts
+
+
+def import_file(db, path, table=None, archive=None, batched=False):
+    """Import an export file; batched commits as it goes instead of in one transaction"""
+    if ".csv" in path:
+        if table not in EXPORT_TABLES:
+            raise ValueError("CSV imports need --table")
+        with connect(db, archive) as conn:
+            nullable = nullable_columns(conn, table)
+        records = functools.partial(iter_csv, path, table, nullable)
+    else:
+        records = functools.partial(iter_jsonl, path)
+    if batched:
+        return import_in_batches(db, records, archive=archive)
+    return import_records(db, records(), archive=archive)
+
+
+def export_file(db, path, table=None, archive=None):
+    if ".csv" in path:
+        if table not in EXPORT_TABLES:
+            raise ValueError("CSV exports need --table")
+        return export_csv(db, path, table, archive)
+    return export_jsonl(db, path, [table] if table else EXPORT_TABLES, archive)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import vouch data")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("path", help="*.jsonl[.gz] for all tables, *.csv[.gz] for one table")
+    parser.add_argument("--db", default="vouches.db")
+    parser.add_argument("--table", choices=EXPORT_TABLES)
+    parser.add_argument("--archive", help=f"archive file to attach (default {DEFAULT_ARCHIVE} if it exists)")
+    args = parser.parse_args()
+    if ".csv" in args.path and not args.table:
+        parser.error("CSV files hold a single table, pass --table")
+    archive = args.archive or (DEFAULT_ARCHIVE if os.path.exists(DEFAULT_ARCHIVE) else None)
+
+    start = time.time()
+    if args.action == "export":
+        count = export_file(args.db, args.path, args.table, archive)
+        print(f"Exported {count} rows to {args.path} in {time.time() - start:.1f}s")
+    else:
+        counts = import_file(args.db, args.path, args.table, archive)
+        summary = ", ".join(f"{table}: {n}" for table, n in counts.items()) or "nothing"
+        print(f"Imported {summary} in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
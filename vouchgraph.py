@@ -0,0 +1,212 @@
+"""Compact who-vouched-for-whom graph for spotting vouch rings.
+
+Edges live in CSR form (offset + target arrays, both directions) so millions
+of vouches fit in a few bytes each. New vouches go into a small overlay that
+is folded into the arrays once it grows past COMPACT_THRESHOLD.
+"""
+import bisect
+from array import array
+
+COMPACT_THRESHOLD = 10000  # Overlay edges before the CSR arrays are rebuilt
+CLUSTER_MIN_SIZE = 3
+CLUSTER_MIN_DENSITY = 0.5  # Share of possible mutual pairs present in a cluster
+INFLOW_MIN_VOUCHES = 5
+INFLOW_THROWAWAY_SHARE = 0.6  # Share of vouchers that look like sockpuppets
+
+
+def build_csr(node_count, srcs, dsts):
+    """(offsets, targets) for edges given as parallel src/dst index arrays"""
+    offsets = array("q", [0]) * (node_count + 1)
+    for src in srcs:
+        offsets[src + 1] += 1
+    for i in range(node_count):
+        offsets[i + 1] += offsets[i]
+    targets = array("q", [0]) * len(srcs)
+    fill = array("q", offsets[:-1])
+    for src, dst in zip(srcs, dsts):
+        targets[fill[src]] = dst
+        fill[src] += 1
+    for i in range(node_count):
+        start, end = offsets[i], offsets[i + 1]
+        if end - start > 1:
+            targets[start:end] = array("q", sorted(targets[start:end]))
+    return offsets, targets
+
+
+class VouchGraph:
+    def __init__(self, edges=()):
+        self.index = {}  # user_id -> node index
+        self.user_ids = array("q")
+        self._out = (array("q", [0]), array("q"))
+        self._in = (array("q", [0]), array("q"))
+        self._extra_out = {}  # overlay: node -> set of targets not yet compacted
+        self._extra_in = {}
+        self._extra_count = 0
+        self.load(edges)
+
+    def _node(self, user_id):
+        node = self.index.get(user_id)
+        if node is None:
+            node = self.index[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+        return node
+
+    def load(self, edges):
+        """Replace the graph with (voucher_id, vouched_id) pairs from any iterable"""
+        self.index = {}
+        self.user_ids = array("q")
+        srcs, dsts = array("q"), array("q")
+        for a, b in edges:
+            if a != b:
+                srcs.append(self._node(a))
+                dsts.append(self._node(b))
+        self._build(srcs, dsts)
+
+    def _build(self, srcs, dsts):
+        n = len(self.user_ids)
+        self._out = build_csr(n, srcs, dsts)
+        self._in = build_csr(n, dsts, srcs)
+        self._extra_out = {}
+        self._extra_in = {}
+        self._extra_count = 0
+
+    def compact(self):
+        srcs, dsts = array("q"), array("q")
+        for src, dst in self.edges():
+            srcs.append(src)
+            dsts.append(dst)
+        self._build(srcs, dsts)
+
+    @property
+    def edge_count(self):
+        return len(self._out[1]) + self._extra_count
+
+    def _neighbours(self, csr, extra, node):
+        offsets, targets = csr
+        if node + 1 < len(offsets):
+            yield from targets[offsets[node]:offsets[node + 1]]
+        yield from extra.get(node, ())
+
+    def out_nodes(self, node):
+        return self._neighbours(self._out, self._extra_out, node)
+
+    def in_nodes(self, node):
+        return self._neighbours(self._in, self._extra_in, node)
+
+    def out_degree(self, node):
+        offsets = self._out[0]
+        base = offsets[node + 1] - offsets[node] if node + 1 < len(offsets) else 0
+        return base + len(self._extra_out.get(node, ()))
+
+    def in_degree(self, node):
+        offsets = self._in[0]
+        base = offsets[node + 1] - offsets[node] if node + 1 < len(offsets) else 0
+        return base + len(self._extra_in.get(node, ()))
+
+    def _has(self, src, dst):
+        offsets, targets = self._out
+        if src + 1 < len(offsets):
+            start, end = offsets[src], offsets[src + 1]
+            i = bisect.bisect_left(targets, dst, start, end)
+            if i < end and targets[i] == dst:
+                return True
+        return dst in self._extra_out.get(src, ())
+
+    def has_edge(self, voucher_id, vouched_id):
+        src, dst = self.index.get(voucher_id), self.index.get(vouched_id)
+        return src is not None and dst is not None and self._has(src, dst)
+
+    def add_edge(self, voucher_id, vouched_id):
+        """Record a new vouch; returns False if it was already known"""
+        if voucher_id == vouched_id:
+            return False
+        src, dst = self._node(voucher_id), self._node(vouched_id)
+        if self._has(src, dst):
+            return False
+        self._extra_out.setdefault(src, set()).add(dst)
+        self._extra_in.setdefault(dst, set()).add(src)
+        self._extra_count += 1
+        if self._extra_count >= COMPACT_THRESHOLD:
+            self.compact()
+        return True
+
+    def edges(self):
+        for node in range(len(self.user_ids)):
+            for target in self.out_nodes(node):
+                yield node, target
+
+    def reciprocal_pairs(self):
+        """All (a, b) user pairs that vouched for each other"""
+        for a, b in self.edges():
+            if a < b and self._has(b, a):
+                yield self.user_ids[a], self.user_ids[b]
+
+    def is_reciprocal(self, voucher_id, vouched_id):
+        return self.has_edge(vouched_id, voucher_id)
+
+    def dense_clusters(self, min_size=CLUSTER_MIN_SIZE, min_density=CLUSTER_MIN_DENSITY):
+        """Groups linked by mutual vouches where most members vouch each other"""
+        mutual = {}
+        for a, b in self.edges():
+            if a < b and self._has(b, a):
+                mutual.setdefault(a, set()).add(b)
+                mutual.setdefault(b, set()).add(a)
+
+        seen = set()
+        clusters = []
+        for start in mutual:
+            if start in seen:
+                continue
+            component = []
+            stack = [start]
+            seen.add(start)
+            while stack:
+                node = stack.pop()
+                component.append(node)
+                for other in mutual[node]:
+                    if other not in seen:
+                        seen.add(other)
+                        stack.append(other)
+            size = len(component)
+            if size < min_size:
+                continue
+            links = sum(len(mutual[node]) for node in component) // 2
+            density = links / (size * (size - 1) / 2)
+            if density >= min_density:
+                clusters.append({
+                    "members": sorted(self.user_ids[node] for node in component),
+                    "mutual_links": links,
+                    "density": round(density, 2),
+                })
+        clusters.sort(key=lambda c: (-len(c["members"]), -c["density"]))
+        return clusters
+
+    def inflow_report(self, user_id):
+        """How many of a user's vouchers look like throwaway accounts"""
+        node = self.index.get(user_id)
+        if node is None:
+            return {"user_id": user_id, "vouchers": 0, "throwaway": 0, "share": 0.0}
+        vouchers = list(self.in_nodes(node))
+        # Only ever vouched for this user and nobody vouched for them
+        throwaway = sum(1 for v in vouchers if self.out_degree(v) == 1 and self.in_degree(v) == 0)
+        return {
+            "user_id": user_id,
+            "vouchers": len(vouchers),
+            "throwaway": throwaway,
+            "share": round(throwaway / len(vouchers), 2) if vouchers else 0.0,
+        }
+
+    def is_suspicious_inflow(self, report, min_vouches=INFLOW_MIN_VOUCHES,
+                             min_share=INFLOW_THROWAWAY_SHARE):
+        return report["vouchers"] >= min_vouches and report["share"] >= min_share
+
+    def suspicious_inflows(self, min_vouches=INFLOW_MIN_VOUCHES, min_share=INFLOW_THROWAWAY_SHARE):
+        reports = []
+        for node in range(len(self.user_ids)):
+            if self.in_degree(node) < min_vouches:
+                continue
+            report = self.inflow_report(self.user_ids[node])
+            if self.is_suspicious_inflow(report, min_vouches, min_share):
+                reports.append(report)
+        reports.sort(key=lambda r: (-r["throwaway"], -r["share"]))
+        return reports